@@ -0,0 +1,164 @@
+# archive_writer.py
+# 截图存档：界面更新时只把截图数组放进有界队列，由后台线程编码写盘，队列满时按策略丢弃
+import argparse
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from queue_policy import DROP_POLICIES, put_with_policy
+
+# 格式 -> 扩展名；raw 直接保存 BGRA 数组，frame_source.load_bgra 可读取
+ARCHIVE_FORMATS = {'png': '.png', 'webp': '.webp', 'raw': '.npy'}
+
+
+class ArchiveWriter:
+    """文件名沿用 {root}/YYYYMMDD/HH/{时间}[_{牌}]_龙.png，回放和模板索引按此解析；
+    level 为 PNG 压缩级别 0-9，webp 固定为无损"""
+
+    def __init__(self, root='images', format='png', level=1, workers=2, max_queue=64, drop_policy='drop_oldest'):
+        if format not in ARCHIVE_FORMATS:
+            raise ValueError(f"不支持的存档格式: {format}，可选: {', '.join(ARCHIVE_FORMATS)}")
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"不支持的丢弃策略: {drop_policy}，可选: {', '.join(DROP_POLICIES)}")
+        self.root = root
+        self.format = format
+        self.extension = ARCHIVE_FORMATS[format]
+        if format == 'png':
+            self.params = [cv2.IMWRITE_PNG_COMPRESSION, level]
+        elif format == 'webp':
+            # 质量大于 100 即为无损
+            self.params = [cv2.IMWRITE_WEBP_QUALITY, 101]
+        else:
+            self.params = []
+        self.drop_policy = drop_policy
+        self.queue = queue.Queue(max_queue)
+        # 已创建的按小时目录，不再每次调用 makedirs
+        self.directories = set()
+        self.submitted = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.bytes = 0
+        self.write_time = 0.0
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._work, name=f'archive-{i}', daemon=True) for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, image1, image2, num1=None, num2=None):
+        """放入龙、虎两张 BGRA 截图，num 为牌面编号（识别成功时）；不阻塞，文件时间取提交时刻"""
+        dropped = put_with_policy(self.queue, (datetime.now(), image1, image2, num1, num2), self.drop_policy)
+        with self._lock:
+            self.submitted += 1
+            self.dropped += dropped
+
+    def paths(self, now, num1=None, num2=None):
+        folder = os.path.join(self.root, now.strftime("%Y%m%d"), now.strftime("%H"))
+        formatted_time = now.strftime("%Y%m%d%H%M%S.%f")[:-3]
+        if num1 is not None and num2 is not None:
+            names = (f"{formatted_time}_{num1}_龙", f"{formatted_time}_{num2}_虎")
+        else:
+            names = (f"{formatted_time}_龙", f"{formatted_time}_虎")
+        return folder, [os.path.join(folder, name + self.extension) for name in names]
+
+    def encode(self, image):
+        if self.format == 'raw':
+            return image
+        # 与原来 PIL 保存的 RGB 图片一致，不保存透明通道
+        ok, buffer = cv2.imencode(self.extension, image[..., :3] if image.shape[2] == 4 else image, self.params)
+        if not ok:
+            raise ValueError(f"编码失败: {self.format}")
+        return buffer
+
+    def write(self, now, image1, image2, num1=None, num2=None):
+        folder, paths = self.paths(now, num1, num2)
+        if folder not in self.directories:
+            os.makedirs(folder, exist_ok=True)
+            self.directories.add(folder)
+        size = 0
+        for image, path in zip((image1, image2), paths):
+            data = self.encode(image)
+            # 用 Python 打开文件，支持中文路径
+            with open(path, 'wb') as f:
+                if self.format == 'raw':
+                    np.save(f, data)
+                else:
+                    f.write(data.tobytes())
+                size += f.tell()
+        return size
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            start = time.perf_counter()
+            try:
+                size = self.write(*item)
+            except (OSError, ValueError, cv2.error):
+                with self._lock:
+                    self.failed += 1
+                continue
+            with self._lock:
+                self.written += 1
+                self.bytes += size
+                self.write_time += time.perf_counter() - start
+
+    def stats(self):
+        with self._lock:
+            return {
+                'submitted': self.submitted,
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'queued': self.queue.qsize(),
+                'avg_write_ms': self.write_time / self.written * 1000 if self.written else 0.0,
+                'avg_kb': self.bytes / self.written / 1024 if self.written else 0.0,
+            }
+
+    def format_stats(self):
+        """一行文字的摘要，用于周期报告"""
+        stats = self.stats()
+        return (f"提交 {stats['submitted']} 已写 {stats['written']} 丢弃 {stats['dropped']} 失败 {stats['failed']} "
+                f"排队 {stats['queued']}  平均 {stats['avg_write_ms']:.2f} 毫秒 {stats['avg_kb']:.1f} KB/对")
+
+    def stop(self, timeout=5.0):
+        """写完队列中剩余的截图后退出"""
+        for _ in self._threads:
+            self.queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='比较各存档格式的编码耗时和文件大小')
+    parser.add_argument('--archive', default='images', help='读取已有存档作为样本')
+    parser.add_argument('--count', type=int, default=200)
+    parser.add_argument('--output', default='archive_benchmark')
+    args = parser.parse_args()
+
+    from frame_source import ReplayFrameSource
+
+    pairs = ReplayFrameSource.scan(args.archive)[:args.count]
+    if not pairs:
+        print(f"{args.archive} 中没有存档截图")
+        return
+    frame_source = ReplayFrameSource(args.archive)
+    frames = [frame_source.read() for _ in pairs]
+    for format, level in [('png', 6), ('png', 1), ('png', 0), ('webp', 0), ('raw', 0)]:
+        writer = ArchiveWriter(os.path.join(args.output, f"{format}{level}"), format, level, workers=1,
+                               max_queue=len(frames))
+        for image1, image2 in frames:
+            writer.submit(image1, image2)
+        writer.stop()
+        stats = writer.stats()
+        print(f"{format:<5} level {level}  {stats['avg_write_ms']:.2f} 毫秒/对  {stats['avg_kb']:.1f} KB/对")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,2 @@
+# conftest.py
+# 让 tests 目录下的测试可以直接导入根目录的模块
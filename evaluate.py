@@ -0,0 +1,140 @@
+# evaluate.py
+# 离线批量评估：多进程 DataLoader 解码和预处理，大批次推理，输出吞吐、每批延迟分位数、准确率、混淆矩阵和最低置信度样本
+import argparse
+import csv
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset, DataLoader
+
+from frame_source import load_bgra
+from preprocess import ArrayPreprocessor
+from template_matcher import labelled_dataset_samples, archive_samples
+
+BACKGROUND_NAMES = ['0', '1', '2']
+
+
+def prefix_label_samples(img_dir):
+    """datasets/xxx_3class/{类别}_*.jpg，文件名开头即类别"""
+    samples = []
+    for name in sorted(os.listdir(img_dir)):
+        label = name.split('_')[0]
+        if name.endswith(('.png', '.jpg', '.jpeg', '.bmp')) and label.isdigit():
+            samples.append((Path(img_dir) / name, int(label)))
+    return samples
+
+
+class CropDataset(Dataset):
+    """在 DataLoader 工作进程中解码截图并转为模型输入"""
+
+    def __init__(self, samples, size=64, normalize=True):
+        self.samples = samples
+        self.preprocessor = ArrayPreprocessor(size=size, normalize=normalize)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, idx):
+        path, label = self.samples[idx]
+        # 预处理结果在复用的缓冲区里，批次拼接前需拷贝出来
+        return self.preprocessor([load_bgra(path)])[0].clone(), label, idx
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def evaluate(classifier, samples, batch_size=256, num_workers=4):
+    """返回 (预测, 置信度, 每批推理耗时毫秒列表, 总耗时秒)，预测和置信度按样本顺序排列"""
+    normalize = getattr(classifier.model, 'normalized_input', True)
+    loader = DataLoader(CropDataset(samples, normalize=normalize), batch_size=batch_size, shuffle=False,
+                        num_workers=num_workers, pin_memory=classifier.device.type == 'cuda')
+    predicted = np.empty(len(samples), dtype=np.int64)
+    confidences = np.empty(len(samples), dtype=np.float32)
+    batch_times = []
+    start = time.perf_counter()
+    with torch.no_grad():
+        for batch, _, indices in loader:
+            batch_start = time.perf_counter()
+            output = classifier.model(batch.to(classifier.device, non_blocking=True))
+            batch_confidences, batch_predicted = torch.max(torch.nn.functional.softmax(output, dim=1), 1)
+            # 取回 CPU 时已完成同步，耗时包含完整的前向
+            predicted[indices.numpy()] = batch_predicted.cpu().numpy()
+            confidences[indices.numpy()] = batch_confidences.cpu().numpy()
+            batch_times.append((time.perf_counter() - batch_start) * 1000)
+    return predicted, confidences, batch_times, time.perf_counter() - start
+
+
+def confusion_matrix(labels, predicted, num_classes):
+    matrix = np.zeros((num_classes, num_classes), dtype=np.int64)
+    np.add.at(matrix, (labels, predicted), 1)
+    return matrix
+
+
+def save_confusion_csv(matrix, names, path):
+    # 行为真实类别，列为预测类别
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(['真实\\预测'] + names)
+        for name, row in zip(names, matrix):
+            writer.writerow([name] + row.tolist())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量评估牌面或背景分类模型')
+    parser.add_argument('--model', choices=['card', 'background'], default='card')
+    parser.add_argument('--model-path', help='默认 best_poker_cnn.pth / best_poker_cnn_3class.pth')
+    parser.add_argument('--runtime', default='eager', help='eager / torchscript / onnx / int8')
+    parser.add_argument('--datasets', nargs='*', help='牌面默认 datasets/val，背景默认 datasets/val_3class')
+    parser.add_argument('--archive', default='', help='牌面评估时一并使用的 GUI 截图存档目录，例如 images')
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--lowest', type=int, default=20, help='列出置信度最低的样本数')
+    parser.add_argument('--confusion-csv', default='confusion.csv')
+    args = parser.parse_args()
+
+    if args.model == 'card':
+        from poker_cnn_classifier import PokerImageClassifier, pockers
+
+        classifier = PokerImageClassifier(args.model_path or 'best_poker_cnn.pth', runtime=args.runtime)
+        num_classes, names = 52, pockers
+        samples = []
+        for dataset_dir in args.datasets or ['datasets/val']:
+            samples += labelled_dataset_samples(dataset_dir)
+        if args.archive:
+            samples += archive_samples(args.archive)
+    else:
+        from poker_cnn_classifier_3class import PokerImageClassifier3Class
+
+        classifier = PokerImageClassifier3Class(args.model_path or 'best_poker_cnn_3class.pth', runtime=args.runtime)
+        num_classes, names = 3, BACKGROUND_NAMES
+        samples = []
+        for dataset_dir in args.datasets or ['datasets/val_3class']:
+            samples += prefix_label_samples(dataset_dir)
+    if not samples:
+        print("没有找到带标签的样本")
+        return
+
+    labels = np.array([label for _, label in samples], dtype=np.int64)
+    predicted, confidences, batch_times, elapsed = evaluate(classifier, samples, args.batch_size, args.workers)
+    print(f"样本数: {len(samples)}  批大小: {args.batch_size}  工作进程: {args.workers}")
+    print(f"吞吐: {len(samples) / elapsed:.1f} 张/秒  总耗时: {elapsed:.2f} 秒")
+    print(f"每批推理耗时: p50 {percentile(batch_times, 50):.2f}  p95 {percentile(batch_times, 95):.2f}  "
+          f"p99 {percentile(batch_times, 99):.2f}  最大 {max(batch_times):.2f} 毫秒")
+    print(f"准确率: {(predicted == labels).mean():.4f}  错误: {int((predicted != labels).sum())}")
+
+    matrix = confusion_matrix(labels, predicted, num_classes)
+    save_confusion_csv(matrix, names, args.confusion_csv)
+    print(f"混淆矩阵已保存: {args.confusion_csv}")
+
+    print(f"置信度最低的 {args.lowest} 个样本:")
+    for i in np.argsort(confidences)[:args.lowest]:
+        mark = '' if predicted[i] == labels[i] else '  ✗'
+        print(f"  {confidences[i]:.4f}  真实 {names[labels[i]]}  预测 {names[predicted[i]]}  {samples[i][0]}{mark}")
+
+
+if __name__ == '__main__':
+    main()
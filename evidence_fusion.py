@@ -0,0 +1,40 @@
+# evidence_fusion.py
+# 多帧证据融合：同一次开牌中每个区域最近几帧的识别结果按对数几率累加，几帧都差一点达标时也能尽早决策
+import math
+from collections import deque
+
+
+class EvidenceFusion:
+    """识别只给出 top-1 类别和置信度，每帧看作“是该类别 / 不是”的二元证据：
+    类别 k 的得分为预测为 k 的各帧 log(c / (1 - c)) 之和，越早的帧乘 decay 的帧龄次方；
+    融合置信度 = exp(得分k) / (Σ exp(得分j) + 1)，其中 1 代表没有出现过的类别。
+    单帧时融合置信度等于原置信度，window 为 1 即不融合"""
+
+    def __init__(self, regions=2, window=1, decay=1.0, epsilon=1e-6):
+        self.window = max(1, window)
+        self.decay = decay
+        self.epsilon = epsilon
+        self.frames = [deque(maxlen=self.window) for _ in range(regions)]
+
+    def reset(self):
+        for frames in self.frames:
+            frames.clear()
+
+    def update(self, region, predicted, confidence):
+        """加入一帧结果，返回 (融合后的类别, 融合置信度, 参与融合的帧数)"""
+        frames = self.frames[region]
+        # 模板匹配给出的 1.0 也要截断，否则对数几率为无穷大
+        confidence = min(max(confidence, self.epsilon), 1 - self.epsilon)
+        frames.append((predicted, math.log(confidence / (1 - confidence))))
+        if len(frames) == 1:
+            return predicted, confidence, 1
+        scores = {}
+        weight = 1.0
+        for frame_predicted, log_odds in reversed(frames):
+            scores[frame_predicted] = scores.get(frame_predicted, 0.0) + weight * log_odds
+            weight *= self.decay
+        best = max(scores, key=scores.get)
+        # 减去最大得分再取指数，避免溢出
+        top = scores[best]
+        total = sum(math.exp(score - top) for score in scores.values()) + math.exp(-top)
+        return best, 1.0 / total, len(frames)
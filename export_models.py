@@ -0,0 +1,89 @@
+# export_models.py
+# 导出 TorchScript / ONNX 版本的分类模型，并测量各推理后端的延迟
+import argparse
+import time
+
+import numpy as np
+import torch
+
+from inference_backend import RUNTIMES, runtime_model_path
+from model_optimizer import fuse_model, load_fused, verify_fused
+from poker_cnn import PokerCNN
+from poker_cnn_3class import PokerCNN3Class
+from poker_cnn_classifier import PokerImageClassifier
+from poker_cnn_classifier_3class import PokerImageClassifier3Class
+
+MODELS = [
+    (PokerCNN, 52, PokerImageClassifier, 'best_poker_cnn.pth'),
+    (PokerCNN3Class, 3, PokerImageClassifier3Class, 'best_poker_cnn_3class.pth'),
+]
+
+
+def load_fused_model(model_class, num_classes, model_path):
+    """读取原模型或优化版模型，统一得到 FusedPokerCNN"""
+    checkpoint = torch.load(model_path, map_location='cpu')
+    if checkpoint.get('format') == 'fused':
+        return load_fused(checkpoint)
+    model = model_class(num_classes=num_classes)
+    model.load_state_dict(checkpoint)
+    fused = fuse_model(model)
+    verify_fused(model, fused)
+    return fused
+
+
+@torch.no_grad()
+def export(model_class, num_classes, model_path, opset=18):
+    # 导出的模型都以 FusedPokerCNN 为准，输入为未归一化的 [0, 1] RGB
+    model = load_fused_model(model_class, num_classes, model_path)
+    example = torch.rand(2, 3, 64, 64)
+    expected = model(example)
+
+    torchscript_path = runtime_model_path(model_path, 'torchscript')
+    traced = torch.jit.freeze(torch.jit.trace(model, example))
+    traced.save(torchscript_path)
+    print(f"{model_path} -> {torchscript_path}  误差: {(traced(example) - expected).abs().max().item():.2e}")
+
+    onnx_path = runtime_model_path(model_path, 'onnx')
+    torch.onnx.export(model, example, onnx_path, input_names=['input'], output_names=['logits'],
+                      dynamic_axes={'input': {0: 'batch'}, 'logits': {0: 'batch'}}, opset_version=opset)
+    print(f"{model_path} -> {onnx_path}")
+
+
+def benchmark(classifier_class, model_path, runtimes, batch_size=2, rounds=500, warmup=20):
+    rng = np.random.default_rng(0)
+    images = [rng.integers(0, 256, (59, 59, 4), dtype=np.uint8) for _ in range(batch_size)]
+    for runtime in runtimes:
+        try:
+            classifier = classifier_class(model_path, device='cpu', runtime=runtime)
+        except Exception as e:
+            print(f"{model_path} [{runtime}] 无法加载: {e}")
+            continue
+        for _ in range(warmup):
+            classifier.detect_batch(images)
+        latencies = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            classifier.detect_batch(images)
+            latencies.append(time.perf_counter() - start)
+        latencies = np.array(latencies) * 1000
+        print(f"{model_path} [{runtime}] 批次 {batch_size}: 平均 {latencies.mean():.3f} 毫秒  "
+              f"p50 {np.percentile(latencies, 50):.3f}  p99 {np.percentile(latencies, 99):.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='导出 TorchScript / ONNX 模型并测量推理延迟')
+    parser.add_argument('--skip-export', action='store_true', help='只测量延迟')
+    parser.add_argument('--benchmark', action='store_true', help='测量各推理后端的延迟')
+    parser.add_argument('--runtimes', nargs='+', default=list(RUNTIMES), choices=RUNTIMES)
+    parser.add_argument('--batch-size', type=int, default=2)
+    args = parser.parse_args()
+
+    for model_class, num_classes, classifier_class, model_path in MODELS:
+        if not args.skip_export:
+            export(model_class, num_classes, model_path)
+        if args.benchmark:
+            benchmark(classifier_class, model_path, args.runtimes, batch_size=args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+# frame_change.py
+import cv2
+import numpy as np
+
+
+class FrameChangeDetector:
+    """每个区域保存一个缩小后的指纹，和上一次处理过的帧比较，判断画面是否变化"""
+
+    def __init__(self, size=16, threshold=8):
+        self.size = size
+        self.threshold = threshold
+        self.reference = None
+
+    def fingerprint(self, frame):
+        # 区域平均缩小到 size x size，忽略 alpha 通道
+        return cv2.resize(frame, (self.size, self.size), interpolation=cv2.INTER_AREA)[..., :3].astype(np.int16)
+
+    def update(self, frames):
+        """返回本帧是否有区域发生变化；只在变化时更新参照指纹，缓慢渐变也会累积到阈值"""
+        fingerprints = [self.fingerprint(frame) for frame in frames]
+        if self.reference is not None and len(self.reference) == len(fingerprints):
+            changed = any(np.abs(current - previous).max() > self.threshold
+                          for current, previous in zip(fingerprints, self.reference))
+            if not changed:
+                return False
+        self.reference = fingerprints
+        return True
+
+    def reset(self):
+        self.reference = None
@@ -0,0 +1,126 @@
+# frame_source.py
+import time
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from screen_capture import ScreenCapture
+
+
+def load_bgra(path):
+    """读取图片为 BGRA 数组（用 imdecode 以支持中文路径）；.npy 为 raw 格式存档的原始数组"""
+    if str(path).endswith('.npy'):
+        return np.load(str(path))
+    data = np.fromfile(str(path), dtype=np.uint8)
+    image = cv2.imdecode(data, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise ValueError(f"无法读取图片: {path}")
+    if image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2BGRA)
+    if image.shape[2] == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+    return image
+
+
+class FrameSource:
+    """帧来源接口：read() 返回龙、虎区域的 BGRA 图像列表，没有更多帧时返回 None"""
+
+    def read(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class LiveFrameSource(FrameSource):
+    """实时屏幕截图"""
+
+    def __init__(self, regions):
+        self.capture = ScreenCapture(regions)
+
+    def read(self):
+        return self.capture.grab_regions()
+
+    def close(self):
+        self.capture.close()
+
+
+class ReplayFrameSource(FrameSource):
+    """回放 GUI 存档的截图：images/YYYYMMDD/HH/{时间}[_{牌}]_龙.png 与对应的 _虎.png"""
+
+    def __init__(self, image_folder='images', realtime=False):
+        self.pairs = self.scan(image_folder)
+        self.realtime = realtime
+        self.index = 0
+        self.frames_read = 0
+        self._start = None
+
+    @staticmethod
+    def scan(image_folder):
+        # 识别成功的截图文件名带牌面编号，龙虎编号不同，按时间前缀配对
+        groups = {}
+        for path in Path(image_folder).glob('*/*/*_*'):
+            side = path.stem.rsplit('_', 1)[-1]
+            if side in ('龙', '虎'):
+                groups.setdefault((path.parent, path.name.split('_')[0]), {})[side] = path
+        pairs = []
+        for (_, time_str), paths in groups.items():
+            if len(paths) != 2:
+                continue
+            try:
+                timestamp = datetime.strptime(time_str, '%Y%m%d%H%M%S.%f').timestamp()
+            except ValueError:
+                continue
+            pairs.append((timestamp, paths['龙'], paths['虎']))
+        pairs.sort(key=lambda pair: pair[0])
+        return pairs
+
+    def read(self):
+        if self.index >= len(self.pairs):
+            return None
+        timestamp, path1, path2 = self.pairs[self.index]
+        self.index += 1
+        if self.realtime:
+            # 按存档时间间隔回放
+            if self._start is None:
+                self._start = (time.monotonic(), timestamp)
+            delay = self._start[0] + (timestamp - self._start[1]) - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        self.frames_read += 1
+        return [load_bgra(path1), load_bgra(path2)]
+
+
+class VideoFrameSource(FrameSource):
+    """回放录屏视频，origin 为视频左上角对应的屏幕坐标"""
+
+    def __init__(self, video_path, regions, origin=(0, 0), realtime=False):
+        self.video = cv2.VideoCapture(str(video_path))
+        if not self.video.isOpened():
+            raise ValueError(f"无法打开视频: {video_path}")
+        self.slices = [(slice(region[1] - origin[1], region[3] - origin[1]),
+                        slice(region[0] - origin[0], region[2] - origin[0])) for region in regions]
+        fps = self.video.get(cv2.CAP_PROP_FPS)
+        self.frame_interval = 1.0 / fps if realtime and fps > 0 else 0.0
+        self.frames_read = 0
+        self._next_time = None
+
+    def read(self):
+        ok, frame = self.video.read()
+        if not ok:
+            return None
+        if self.frame_interval:
+            now = time.monotonic()
+            if self._next_time is None:
+                self._next_time = now
+            elif self._next_time > now:
+                time.sleep(self._next_time - now)
+            self._next_time += self.frame_interval
+        self.frames_read += 1
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA)
+        return [frame[rows, cols] for rows, cols in self.slices]
+
+    def close(self):
+        self.video.release()
@@ -2,91 +2,129 @@ import asyncio
 import socket
 import cv2
 import numpy as np
-import pyautogui
 import time
 import os
 
 from image_processor import ImageProcessor
+from poll_scheduler import PollScheduler
+from round_state import RoundStateMachine
+from table import Table
+from latency_tracer import LatencyTracer
+from input_backend import create_input_backend
+from runtime_profile import format_cpus
 from poker_cnn_classifier import PokerImageClassifier, Poker
 
 os.environ['PYTHONIOENCODING'] = 'utf-8'
-# 设置默认延迟为0.01秒
-pyautogui.PAUSE = 0.003
-# 设置最小持续时间为0.01秒
-pyautogui.MINIMUM_DURATION = 0.002
 
 
-class GameController:
-    def __init__(self, x=1437, y=883, width=54, distance=146, hotkey_long='1', hotkey_hu='2', hotkey_he='3', log_callback=None, update_image_callback=None, show_hint_callback=None, websocket_server=None):
-        self.x = x
-        self.y = y
-        self.width = width
-        self.distance = distance
-        self.hotkey_long = hotkey_long
-        self.hotkey_hu = hotkey_hu
-        self.hotkey_he = hotkey_he
+class BetActions:
+    """广播识别结果并按热键下注；游戏线程与流水线模式的主进程共用，需提供 tables、log_callback、tracer 和 input_backend"""
+
+    log_pipeline = None
+    # 演练模式：照常决策和记录日志，但不发送广播
+    dry_run = False
+
+    def log(self, template, *args, kind='info'):
+        """有 log_pipeline 时只入队，格式化和输出由后台线程完成；kind 用于按类型限流"""
+        if self.log_pipeline is not None:
+            self.log_pipeline.emit(kind, template, *args)
+        elif self.log_callback:
+            self.log_callback(template.format(*args) if args else template)
+
+    def open_socket(self):
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-        self.regions = [
-            (x, y, x + width, y + width),  # 龙牌截图区域
-            (x + distance, y, x + distance + width, y + width),  # 虎牌截图区域
-            (x - 121, y + 290, x - 121 + 100, y + 290 + 100),  # 龙下注点击区域
-            (x + 253, y + 290, x + 253 + 100, y + 290 + 100),  # 虎下注点击区域
-            (x + 45, y + 238, x + 45 + 100, y + 238 + 70)  # 和下注点击区域
-        ]
-        self.white_radios = [0.0, 0.0]
-        self.is_paused = False
-        self.is_running = True
-        self.log_callback = log_callback
-        self.update_image_callback = update_image_callback
-        self.show_hint_callback = show_hint_callback
-        self.imageProcessor = ImageProcessor(self.regions)
-
-        # 状态变量
-        self.has_seen_card_back = [False, False]
-        self.first_card_back_time = [None, None]
-        self.status = [0, 0]  # 0: 未看到卡牌背景, 1: 看到卡牌背景, 2: 看到卡牌正面
-        # WebSocket 服务实例
-        self.websocket_server = websocket_server
-    def log(self, message):
-        if self.log_callback:
-            self.log_callback(message)
 
     def __del__(self):
         # 关闭套接字
-        self.sock.close()
-
-    def send_broadcast_message(self, card1_index, card2_index, port=5005):
-        # 发送广播消息
-        start = time.time()
-        message = f"{card1_index},{card2_index},{start}"
+        sock = getattr(self, 'sock', None)
+        if sock is not None:
+            sock.close()
+
+    def send_broadcast_message(self, card1_index, card2_index, port=5005, table_name=''):
+        # 发送广播消息，多桌时在末尾附加牌桌名
+        start = self.tracer.now()
+        message = f"{card1_index},{card2_index},{time.time()}" + (f",{table_name}" if table_name else '')
         # if self.websocket_server:
         #     # 使用 call_soon_threadsafe 来安全地调用 asyncio 的协程
         #     self.websocket_server.loop.call_soon_threadsafe(
         #         asyncio.create_task, self.websocket_server.broadcast_message(message)
         #     )
-        self.sock.sendto(message.encode(), ('<broadcast>', port))
-        self.log(f"广播耗时：{(time.time()-start)*1000:.2f}毫秒 消息: {message}")
-
-    def take_action(self, poker1, poker2):
-        self.send_broadcast_message(poker1.classic,poker2.classic)
-        start = time.time()
+        if not self.dry_run:
+            self.sock.sendto(message.encode(), ('<broadcast>', port))
+        end = self.tracer.record('broadcast', start)
+        self.log("广播耗时：{:.2f}毫秒 消息: {}", (end - start) / 1e6, message, kind='broadcast')
+
+    def take_action(self, poker1, poker2, table=None):
+        table = table or self.tables[0]
+        self.send_broadcast_message(poker1.classic,poker2.classic, table_name=table.name)
+        start = self.tracer.now()
         if poker1.card_num == poker2.card_num:
-            key = self.hotkey_he
+            key = table.hotkey_he
             name='和'
         elif poker1.card_num > poker2.card_num:
-            key = self.hotkey_long
+            key = table.hotkey_long
             name = '龙'
         else:
-            key = self.hotkey_hu
+            key = table.hotkey_hu
             name = '虎'
         self.simulate_key_press(key)
-        self.log(f"按键耗时:{(time.time()-start)*1000:.2f}毫秒 龙：{poker1.card}，虎：{poker2.card} 下注{name}，按键【{key}】")
+        end = self.tracer.record('keypress', start)
+        if table.reveal_ns is not None:
+            # 从看到牌面的那一帧截图开始，到按键完成
+            self.tracer.record('reveal_to_keypress', table.reveal_ns, end)
+        self.log("{}按键耗时:{:.2f}毫秒 龙：{}，虎：{} 下注{}，按键【{}】", table.prefix, (end - start) / 1e6, poker1.card,
+                 poker2.card, name, key, kind='keypress')
+
+    def prepare_input(self, input_backend):
+        # 所有牌桌的热键在启动时解析一次，配置错误的热键在这里报错而不是下注时
+        self.input_backend = input_backend.prepare(
+            [key for table in self.tables for key in (table.hotkey_long, table.hotkey_hu, table.hotkey_he)])
 
     def simulate_key_press(self, key):
         if key:
-            pyautogui.press(key)
+            self.input_backend.press(key)
 
+
+class GameController(BetActions):
+    def __init__(self, x=1437, y=883, width=54, distance=146, hotkey_long='1', hotkey_hu='2', hotkey_he='3', log_callback=None, update_image_callback=None, show_hint_callback=None, websocket_server=None, frame_source=None, stats_stride=1, change_threshold=8, scheduler=None, model_options=None, runtime_profile=None, tables=None, tracer=None, log_pipeline=None, input_backend=None, fusion_window=1, fusion_decay=1.0, dry_run=False):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.distance = distance
+        self.hotkey_long = hotkey_long
+        self.hotkey_hu = hotkey_hu
+        self.hotkey_he = hotkey_he
+        self.open_socket()
+        # 多桌模式传入 tables，否则按 x、y、distance 构建一张牌桌
+        self.tables = tables or [Table('', x, y, width, distance, hotkey_long, hotkey_hu, hotkey_he, change_threshold,
+                                       fusion_window, fusion_decay)]
+        self.regions = self.tables[0].regions
+        self.white_radios = [0.0, 0.0]
+        self.is_paused = False
+        self.is_running = True
+        self.log_callback = log_callback
+        self.log_pipeline = log_pipeline
+        self.dry_run = dry_run
+        self.update_image_callback = update_image_callback
+        self.show_hint_callback = show_hint_callback
+        # 所有牌桌的龙、虎区域共用一次截图；model_options 为模型相关配置，原样传给 ImageProcessor
+        capture_regions = [region for table in self.tables for region in table.card_regions]
+        self.imageProcessor = ImageProcessor(capture_regions, frame_source, stats_stride, **(model_options or {}))
+        # 按牌局状态控制截图频率
+        self.scheduler = scheduler or PollScheduler()
+        # 推理线程绑核配置，在游戏线程启动时生效
+        self.runtime_profile = runtime_profile
+        # 各阶段耗时直方图
+        self.tracer = tracer or LatencyTracer()
+        self.frame_start_ns = None
+        self.prepare_input(input_backend or create_input_backend())
+
+        # 每张牌桌一个牌局状态机，状态转移通过事件通知
+        for table in self.tables:
+            table.round.add_listener(lambda event, table=table: self.on_round_event(table, event))
+        # WebSocket 服务实例
+        self.websocket_server = websocket_server
     def get_white_ratio(self, image, threshold=200):
         """检查图片中是否包含超过指定比例的白色像素"""
         gray = np.mean(image, axis=2)  # 更快地转换为灰度图
@@ -111,180 +149,160 @@ class GameController:
     def run(self,confidence_threshold=0.9999):
         if self.show_hint_callback:
             self.show_hint_callback()
-        self.log("开始游戏...")
-        status = [0,0]
-        last_white_ratio = [0.0, 0.0]
-        recongnize_cnt = 0
+        self.log(f"开始游戏... 按键方式: {self.input_backend.name}")
+        cpus = self.runtime_profile.pin_inference_thread() if self.runtime_profile else []
+        if cpus:
+            self.log(f"游戏线程已绑定核心: {format_cpus(cpus)}")
         while self.is_running:
             if self.is_paused:
                 time.sleep(0.05)
+                self.scheduler.reset()
                 continue
 
-            start_time = time.time()
+            self.scheduler.wait(self.poll_state())
+            report = self.scheduler.report()
+            if report:
+                self.log_report(report)
+            self.tracer.maybe_dump()
+
+            start_ns = self.frame_start_ns = self.tracer.now()
             # 使用 ImageProcessor 处理截图
-            white_ratio1,red_ratio1, image1, white_ratio2, red_ratio2, image2 = self.imageProcessor.process_images()
-            screenshot_time = time.time()
-            # self.log(f"red1:{red_ratio1}  red2:{red_ratio2}")
-            card_front1,card_front2 = self.check_card_background(status, white_ratio1, white_ratio2, image1, image2,red_ratio1,red_ratio2)
-            if not card_front1 and not card_front2:
+            frames = self.imageProcessor.grab_frames()
+            if frames is None:
+                self.log("没有更多画面，结束游戏...")
+                break
+            capture_ns = self.tracer.record('capture', start_ns)
+
+            # 各牌桌分别推进状态机，需要推理的截图汇总后每种模型只调用一次
+            back_checks, recognitions = [], []
+            for index, table in enumerate(self.tables):
+                image1, image2 = frames[2 * index:2 * index + 2]
+                table.frames += 1
+                if not table.change_detector.update([image1, image2]):
+                    continue
+                table.changed_frames += 1
+                white_ratio1, red_ratio1 = self.imageProcessor.pixel_ratios(image1)
+                white_ratio2, red_ratio2 = self.imageProcessor.pixel_ratios(image2)
+                action = table.round.observe(white_ratio1, red_ratio1, white_ratio2, red_ratio2)
+                if action == RoundStateMachine.CHECK_BACKS:
+                    back_checks.append((table, image1, image2, white_ratio1, white_ratio2))
+                elif action == RoundStateMachine.RECOGNIZE:
+                    recognitions.append((table, image1, image2))
+            stats_ns = self.tracer.record('stats', capture_ns)
+
+            if back_checks:
+                background_ns = self.tracer.now()
+                predicted, confidences = self.imageProcessor.detect_backgrounds(
+                    [image for _, image1, image2, _, _ in back_checks for image in (image1, image2)])
+                self.tracer.record('background', background_ns)
+                for i, (table, image1, image2, white_ratio1, white_ratio2) in enumerate(back_checks):
+                    b1, b2 = predicted[2 * i:2 * i + 2]
+                    c1, c2 = confidences[2 * i:2 * i + 2]
+                    table.back_checks += 1
+                    if table.round.confirm_backs(c1 > 0.95 and b1 == 1 and c2 > 0.95 and b2 == 1):
+                        self.log("{}龙 卡牌背面 {:.4f}  置信度:{:.4f}  虎 卡牌背面 {:.4f}  置信度:{:.4f}", table.prefix,
+                                 white_ratio1, c1, white_ratio2, c2, kind='backs')
+                        self.update_image_callback(image1, image2, None, None)
+            if not recognitions:
                 continue
-            # 检查是否满足所有条件
-            if (self.has_seen_card_back[0] and self.has_seen_card_back[1]
-                    and self.first_card_back_time[1] is not None
-                    and self.first_card_back_time[0] is not None
-            ):
-                # 使用 ImageProcessor 处理图像识别
-                if recongnize_cnt>10 and abs(last_white_ratio[0]-white_ratio1)<0.01 and abs(last_white_ratio[1]-white_ratio2)<0.01 :
-                    continue;
-                predicted_class1, confidence1, predicted_class2, confidence2 = self.imageProcessor.detect_images(image1, image2)
-                detection_time = time.time()
-                poker1 = Poker(predicted_class1)
-                poker2 = Poker(predicted_class2)
 
-                if confidence1 >= confidence_threshold and confidence2 >= confidence_threshold:
-                    last_white_ratio = [white_ratio1, white_ratio2]
-                    self.log(f"龙{poker1.card} [{confidence1:.4f}]  - 虎{poker2.card} [{confidence2:.4f}] ")
-                    self.log(f"截图耗时: {(screenshot_time - start_time) * 1000:.2f} 毫秒")
-                    self.log(f"识别图耗时: {(detection_time - screenshot_time) * 1000:.2f} 毫秒")
-                    self.log(f"总处理耗时: {(time.time() - start_time) * 1000:.2f} 毫秒")
-                    if recongnize_cnt > 3:
-                        self.log(f"不进行下注因为识别次数超3次共: {recongnize_cnt}次")
-                    elif time.time()-self.first_card_back_time[0]<15.0 and time.time()-self.first_card_back_time[1]<15:
-                        self.take_action(poker1, poker2)
-                    else:
-                        self.log("时间太长，不进行下注")
-                    recongnize_cnt = 0
-                    self.update_image_callback(image1, image2, poker1, poker2)
-                    # 重置状态变量
-                    self.has_seen_card_back = [False, False]
-                    self.first_card_back_time = [None, None]
-                else:
-                    recongnize_cnt+=1
-                    last_white_ratio = [white_ratio1,white_ratio2]
-                    self.log(f"识别失败，置信度不够 龙{poker1.card} [{confidence1:.4f}]  - 虎{poker2.card} [{confidence2:.4f}] ")
-                    self.log(f"截图耗时: {(screenshot_time - start_time) * 1000:.2f} 毫秒")
-                    self.log(f"识别图耗时: {(detection_time - screenshot_time) * 1000:.2f} 毫秒")
-                    self.log(f"总处理耗时: {(time.time() - start_time) * 1000:.2f} 毫秒")
-                    self.update_image_callback(image1, image2, poker1, poker2)
+            # 使用 ImageProcessor 处理图像识别
+            cards_ns = self.tracer.now()
+            predicted, confidences = self.imageProcessor.detect_cards(
+                [image for _, image1, image2 in recognitions for image in (image1, image2)])
+            detection_ns = self.tracer.record('cards', cards_ns)
+            for i, (table, image1, image2) in enumerate(recognitions):
+                predicted_class1, predicted_class2 = predicted[2 * i:2 * i + 2]
+                confidence1, confidence2 = confidences[2 * i:2 * i + 2]
+                self.handle_recognition(table, image1, image2, predicted_class1, confidence1, predicted_class2,
+                                        confidence2, confidence_threshold, start_ns, stats_ns, detection_ns)
+        self.imageProcessor.close_frame_source()
+
+    def poll_state(self):
+        # 任一牌桌在开牌时按最快的频率截图
+        return PollScheduler.fastest([table.round.poll_state() for table in self.tables])
+
+    def handle_recognition(self, table, image1, image2, predicted_class1, confidence1, predicted_class2, confidence2,
+                           confidence_threshold, start_ns, stats_ns, detection_ns):
+        table.recognitions += 1
+        # 与本次开牌之前几帧的结果融合，window 为 1 时原样返回
+        predicted_class1, confidence1, frames1 = table.fusion.update(0, predicted_class1, confidence1)
+        predicted_class2, confidence2, frames2 = table.fusion.update(1, predicted_class2, confidence2)
+        poker1 = Poker(predicted_class1)
+        poker2 = Poker(predicted_class2)
+        prefix = table.prefix
+
+        if confidence1 >= confidence_threshold and confidence2 >= confidence_threshold:
+            result = table.round.decide()
+            table.decisions += 1
+            if frames1 > 1 or frames2 > 1:
+                table.fused_decisions += 1
+            if table.reveal_ns is not None:
+                self.tracer.record('reveal_to_decision', table.reveal_ns)
+            self.log("{}龙{} [{:.4f}]  - 虎{} [{:.4f}] ", prefix, poker1.card, confidence1, poker2.card, confidence2,
+                     kind='decision')
+            self.log_timing(prefix, start_ns, stats_ns, detection_ns)
+            if result == RoundStateMachine.BET:
+                table.bets += 1
+                self.take_action(poker1, poker2, table)
+            elif result == RoundStateMachine.TOO_MANY_ATTEMPTS:
+                self.log("{}不进行下注因为识别次数超{}次", prefix, table.round.max_attempts, kind='decision')
             else:
-                self.first_card_back_time = [None, None]
-                self.has_seen_card_back = [False, False]
-
-    def _check_card_background(self, status, white_ratio1, white_ratio2, image1, image2,red_ration1,red_ration2):
-        if red_ration1>0.20 and red_ration2>0.20 and white_ratio1<=0.063 and white_ratio2<=0.063:
-            if status[0]!=1 and status[1]!=1:
-                b1, c1, b2, c2 = self.imageProcessor.detect_images_background(image1, image2)
-                if c1>0.95 and b1==1 and c2>0.95 and b2==1:
-                    self.first_card_back_time[0] = time.time()
-                    self.has_seen_card_back[0] = True
-                    self.log(f"虎 卡牌背景 {white_ratio2:.4f}")
-                    self.first_card_back_time[1] = time.time()
-                    self.has_seen_card_back[1] = True
-                    self.log(f"龙 卡牌背景 {white_ratio1:.4f}")
-                    status[0]=1
-                    status[1]=1
-                    self.update_image_callback(image1, image2, None, None)
-
+                self.log("{}时间太长，不进行下注", prefix, kind='decision')
+            self.update_image_callback(image1, image2, poker1, poker2)
         else:
-            if white_ratio1 <= 0.008:
-                if status[0] != 0:
-                    status[0] = 0
-                    self.log(f"龙 无牌 {white_ratio1:.4f}")
-            # elif 0.008 < white_ratio1 <= 0.025:
-            #     if status[0] != 1:
-            #         status[0] = 1
-            elif 0.60 <= white_ratio1:
-                if status[0] != 2:
-                    status[0] = 2
-                    self.log(f"龙 其他背景 {white_ratio2:.4f}")
-
-            if 0.025 < white_ratio1 < 0.60:
-                if status[0] != 3:
-                    status[0] = 3
-                    # 卡牌正面
-                    self.log(f"龙 卡牌正面 {white_ratio1:.4f}")
-
-            if white_ratio2 <= 0.008:
-                if status[1] != 0:
-                    status[1] = 0
-                    self.log(f"虎 无牌 {white_ratio2:.4f}")
-            # elif 0.008 < white_ratio2 <= 0.025:
-            #     if status[1] != 1:
-            #         status[1] = 1
-
-            elif 0.60 <= white_ratio2:
-                if status[1] != 2:
-                    status[1] = 2
-                    self.log(f"虎 其他背景 {white_ratio2:.4f}")
-
-            if 0.025 < white_ratio2 < 0.60:
-                if status[1] != 3:
-                    status[1] = 3
-                    # 卡牌正面
-                    self.log(f"虎 卡牌正面 {white_ratio2:.4f}")
-
-        # if old_status0!=1 and status[0]==1 and old_status1!=1 and status[1]==1:
-
-        card_front1 = 0.025 <= white_ratio1 < 0.60
-        card_front2 = 0.025 <= white_ratio2 < 0.60
-
-        return card_front1,card_front2
-
-
-    def check_card_background(self, status, white_ratio1, white_ratio2, image1, image2,red_ration1,red_ration2):
-        if red_ration1>0.20 and red_ration2>0.20 and white_ratio1<=0.063 and white_ratio2<=0.063:
-            if status[0]!=1 and status[1]!=1:
-                b1, c1, b2, c2 = self.imageProcessor.detect_images_background(image1, image2)
-                if c1>0.95 and b1==1 and c2>0.95 and b2==1:
-                    self.first_card_back_time[0] = time.time()
-                    self.has_seen_card_back[0] = True
-                    self.log(f"龙 卡牌背面 {white_ratio1:.4f}  置信度:{c1:.4f}")
-
-                    self.first_card_back_time[1] = time.time()
-                    self.has_seen_card_back[1] = True
-                    self.log(f"虎 卡牌背面 {white_ratio2:.4f}  置信度:{c2:.4f}")
-
-                    status[0]=1
-                    status[1]=1
-                    self.update_image_callback(image1, image2, None, None)
-        else:
-            if white_ratio1 <= 0.01:
-                if status[0] != 0:
-                    status[0] = 0
-                    self.log(f"龙 无牌 {white_ratio1:.4f}")
-            elif 0.60 <= white_ratio1:
-                if status[0] != 2:
-                    status[0] = 2
-                    self.log(f"龙 其他背面 {white_ratio2:.4f}")
-
-            if 0.063 < white_ratio1 < 0.60:
-                if status[0] != 3:
-                    status[0] = 3
-                    # 卡牌正面
-                    self.log(f"龙 卡牌正面 {white_ratio1:.4f}")
-
-            if white_ratio2 <= 0.01:
-                if status[1] != 0:
-                    status[1] = 0
-                    self.log(f"虎 无牌 {white_ratio2:.4f}")
-            # elif 0.008 < white_ratio2 <= 0.025:
-            #     if status[1] != 1:
-            #         status[1] = 1
-
-            elif 0.60 <= white_ratio2:
-                if status[1] != 2:
-                    status[1] = 2
-                    self.log(f"虎 其他背面 {white_ratio2:.4f}")
-
-            if 0.063 < white_ratio2 < 0.60:
-                if status[1] != 3:
-                    status[1] = 3
-                    # 卡牌正面
-                    self.log(f"虎 卡牌正面 {white_ratio2:.4f}")
-
-        # if old_status0!=1 and status[0]==1 and old_status1!=1 and status[1]==1:
-
-        card_front1 = 0.063 <= white_ratio1 < 0.60 and white_ratio1>red_ration1
-        card_front2 = 0.063 <= white_ratio2 < 0.60 and white_ratio2>red_ration2
-
-        return card_front1,card_front2
\ No newline at end of file
+            result = table.round.reject()
+            self.log("{}识别失败，置信度不够 龙{} [{:.4f}]  - 虎{} [{:.4f}] ", prefix, poker1.card, confidence1,
+                     poker2.card, confidence2, kind='unsure')
+            self.log_timing(prefix, start_ns, stats_ns, detection_ns)
+            if result == RoundStateMachine.TOO_MANY_ATTEMPTS:
+                self.log("{}识别次数超{}次，放弃本局", prefix, table.round.max_attempts, kind='decision')
+            elif result == RoundStateMachine.TIMED_OUT:
+                self.log("{}识别超时，放弃本局", prefix, kind='decision')
+            self.update_image_callback(image1, image2, poker1, poker2)
+
+    def log_timing(self, prefix, start_ns, stats_ns, detection_ns):
+        self.log("{}截图耗时: {:.2f} 毫秒", prefix, (stats_ns - start_ns) / 1e6, kind='timing')
+        self.log("{}识别图耗时: {:.2f} 毫秒", prefix, (detection_ns - stats_ns) / 1e6, kind='timing')
+        self.log("{}总处理耗时: {:.2f} 毫秒", prefix, (self.tracer.now() - start_ns) / 1e6, kind='timing')
+
+    def log_report(self, report):
+        self.log(f"帧率: {report[0]:.1f} 帧/秒  超出 {self.scheduler.frame_budget * 1000:.0f} 毫秒预算的帧: {report[1]}")
+        for name, stats in self.imageProcessor.cache_stats():
+            self.log(f"{name}缓存: 命中 {stats['hits']} 未命中 {stats['misses']} 淘汰 {stats['evictions']} "
+                     f"命中率 {stats['hit_rate']:.1%}")
+        cascade_stats = self.imageProcessor.cascade_stats()
+        if cascade_stats:
+            self.log(f"背景级联: 小模型判定 {cascade_stats['tiny_accepted']} 转完整模型 {cascade_stats['fallbacks']} "
+                     f"转交率 {cascade_stats['fallback_rate']:.1%}")
+        template_stats = self.imageProcessor.template_stats()
+        if template_stats:
+            self.log(f"模板匹配: 命中 {template_stats['hits']} 转 CNN {template_stats['misses']} "
+                     f"命中率 {template_stats['hit_rate']:.1%} 平均 {template_stats['avg_match_ms']:.3f} 毫秒")
+        for table in self.tables:
+            stats = table.stats()
+            self.log(f"{table.prefix}画面变化 {stats['changed_frames']}/{stats['frames']}  牌背确认 {stats['back_checks']}  "
+                     f"识别 {stats['recognitions']}  决策 {stats['decisions']}（多帧融合 {stats['fused_decisions']}）  "
+                     f"下注 {stats['bets']}")
+            self.log(f"{table.prefix}状态停留: " + "  ".join(
+                f"{state} {count}次 平均 {average:.0f} 最长 {longest:.0f} 毫秒"
+                for state, (count, average, longest) in table.round.stats().items() if count))
+        self.log(f"耗时分位数(毫秒): {self.tracer.format()}")
+        # 推理进程的日志在主进程统计
+        log_stats = self.log_pipeline.format() if self.log_pipeline is not None else ''
+        if log_stats:
+            self.log(f"日志: {log_stats}")
+
+    def dump_latency(self):
+        """把各阶段耗时直方图写入 JSON 文件，返回文件路径"""
+        return self.tracer.dump()
+
+    def on_round_event(self, table, event):
+        if event.kind == 'round' and event.target == RoundStateMachine.REVEALING:
+            # 开牌从本帧截图开始时计时，之前的识别结果不参与融合
+            table.reveal_ns = self.frame_start_ns
+            table.fusion.reset()
+        # 只记录牌局状态转移，单个区域的画面类别变化不写日志
+        if event.kind == 'round':
+            self.log("{}牌局状态 {} -> {}  停留 {:.0f} 毫秒", table.prefix, event.source, event.target,
+                     event.duration * 1000, kind='round')
@@ -1,78 +1,145 @@
 # image_processor.py
-import cv2
-import numpy as np
-import mss
-import mss.tools
-from PIL import Image
-from concurrent.futures import ThreadPoolExecutor
-
 from poker_cnn_classifier import PokerImageClassifier
 from poker_cnn_classifier_3class import PokerImageClassifier3Class
+from poker_cnn_classifier_multihead import PokerImageClassifierMultiHead
+from frame_source import LiveFrameSource
+from pixel_stats import build_pixel_lut, get_white_red_ratio
+from template_matcher import TemplateIndex
+from model_registry import registry
 
 
 class ImageProcessor:
-    def __init__(self, regions):
+    def __init__(self, regions, frame_source=None, stats_stride=1, **model_options):
         self.regions = regions
-        self.executor = ThreadPoolExecutor(max_workers=2)
-        self.cnn = PokerImageClassifier()  # 每个子进程独立初始化 PokerImageClassifier
-        self.cnn_3 = PokerImageClassifier3Class()
-
-    def get_white_ratio(self, image, threshold=200):
-        """检查图片中是否包含超过指定比例的白色像素"""
-        gray = np.mean(image, axis=2)  # 更快地转换为灰度图
-        white_pixels = np.count_nonzero(gray > threshold)
-        total_pixels = gray.size
-        return white_pixels / total_pixels
-
-    def grab_screenshot(self, region_index):
-        with mss.mss() as sct:
-            screenshot = sct.grab(self.regions[region_index])
-            frame = np.array(screenshot)
-            white_ratio = self.get_white_ratio(frame)
-            red_ratio = self._get_red_ratio(frame)
-            image = Image.frombytes("RGB", screenshot.size, screenshot.rgb)
-            return region_index, white_ratio, red_ratio, image
-
-    def _get_red_ratio(self, image, lower_red1=(0, 100, 100), upper_red1=(10, 255, 255),
-                       lower_red2=(160, 100, 100), upper_red2=(180, 255, 255)):
-        """统计红色像素占比（HSV颜色空间）"""
-        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-        # 定义红色在HSV中的两个范围（色相环首尾）
-        mask1 = cv2.inRange(hsv, lower_red1, upper_red1)
-        mask2 = cv2.inRange(hsv, lower_red2, upper_red2)
-        red_mask = cv2.bitwise_or(mask1, mask2)
-        return np.count_nonzero(red_mask) / red_mask.size
-
-    def detect_image_with_index(self, args):
-        image, index = args
-        predicted_class, confidence = self.cnn.detect_image(image)
-        return index, predicted_class, confidence
-
-    def detect_image_with_background(self, args):
-        image, index = args
-        predicted_class, confidence = self.cnn_3.detect_image(image)
-        return index, predicted_class, confidence
+        self.stats_stride = stats_stride
+        # regions 为所有牌桌的龙、虎截图区域，默认实时截图，所有区域共用一次截图
+        self.frame_source = frame_source or LiveFrameSource(regions)
+        # 模型由注册表统一加载，启动时已在后台预加载的直接复用
+        models = self.load_models(**model_options)
+        self.multihead = models.get('multihead')
+        self._multihead_results = []
+        self.cnn = models.get('cnn')
+        self.cnn_3 = models.get('cnn_3')
+        self.templates = models.get('templates')
 
-    def process_images(self):
-        futures = [self.executor.submit(self.grab_screenshot, i) for i in [0, 1]]
-        results = [future.result() for future in futures]
-        region_index1, white_ratio1, red_ratio1, image1 = results[0]
-        region_index2, white_ratio2, red_ratio2, image2 = results[1]
+    @staticmethod
+    def load_models(multihead_model_path=None, card_model_path='best_poker_cnn.pth',
+                    background_model_path='best_poker_cnn_3class.pth', runtime='eager', cache_size=0,
+                    background_cascade_model_path=None, background_cascade_threshold=0.98,
+                    template_index_path=None, template_min_similarity=0.97, template_min_margin=0.05):
+        """按配置从注册表取得所需模型，同一进程内每个模型只加载一次"""
+        models = {}
+        if multihead_model_path:
+            # 共享主干的多头模型同时给出牌面和背景结果，只加载这一个网络
+            models['multihead'] = registry.get(
+                ('multihead', multihead_model_path),
+                lambda: PokerImageClassifierMultiHead(multihead_model_path))
+        else:
+            # 模型路径可指向 model_optimizer.py 导出的优化版，runtime 可选 eager / torchscript / onnx / int8
+            models['cnn'] = registry.get(
+                ('card', card_model_path, runtime, cache_size),
+                lambda: PokerImageClassifier(card_model_path, runtime=runtime, cache_size=cache_size))
+            # 配置了低分辨率小模型时背景判断走级联，小模型拿不准才运行完整模型
+            models['cnn_3'] = registry.get(
+                ('background', background_model_path, runtime, cache_size,
+                 background_cascade_model_path, background_cascade_threshold),
+                lambda: PokerImageClassifier3Class(background_model_path, runtime=runtime, cache_size=cache_size,
+                                                   cascade_model_path=background_cascade_model_path,
+                                                   cascade_threshold=background_cascade_threshold))
+        if template_index_path:
+            # 牌面模板索引，差距明显时不再运行 52 类 CNN
+            models['templates'] = registry.get(
+                ('templates', template_index_path, template_min_similarity, template_min_margin),
+                lambda: TemplateIndex.load(template_index_path, min_similarity=template_min_similarity,
+                                           min_margin=template_min_margin))
+        # 提前构建颜色查找表，避免第一帧卡顿
+        build_pixel_lut()
+        return models
+
+    def grab_frames(self):
+        # 返回 None 表示回放结束
+        return self.frame_source.read()
+
+    def analyze_frames(self, frames):
+        # 识别直接使用截图数组，PIL 图片只在界面显示和存档时生成
+        image1, image2 = frames
+        white_ratio1, red_ratio1 = get_white_red_ratio(image1, stride=self.stats_stride)
+        white_ratio2, red_ratio2 = get_white_red_ratio(image2, stride=self.stats_stride)
         return white_ratio1,red_ratio1, image1, white_ratio2, red_ratio2,image2
 
+    def pixel_ratios(self, frame):
+        """单个区域的 (白色占比, 红色占比)"""
+        return get_white_red_ratio(frame, stride=self.stats_stride)
+
+    def process_images(self):
+        frames = self.grab_frames()
+        if frames is None:
+            return None
+        return self.analyze_frames(frames)
+
+    def _detect_multihead(self, images):
+        # 同一批截图先判断背景再识别牌面时复用上一次前向的结果
+        previous = self._multihead_results
+        if len(previous) != len(images) or any(image is not cached for image, (cached, _) in zip(images, previous)):
+            results = list(zip(*self.multihead.detect_batch(images)))
+            self._multihead_results = list(zip(images, results))
+        return [list(values) for values in zip(*[result for _, result in self._multihead_results])]
+
     def detect_images(self, image1, image2):
-        futures = [self.executor.submit(self.detect_image_with_index, (img, idx)) for idx, img in enumerate([image1, image2])]
-        results = [future.result() for future in futures]
-        index1, predicted_class1, confidence1 = results[0]
-        index2, predicted_class2, confidence2 = results[1]
+        (predicted_class1, predicted_class2), (confidence1, confidence2) = self.detect_cards([image1, image2])
         return predicted_class1, confidence1, predicted_class2, confidence2
 
+    def detect_cards(self, images):
+        """任意张牌面截图一次识别，返回 (类别列表, 置信度列表)"""
+        if not self.templates:
+            return self._detect_cards(images)
+        # 模板匹配通过即视为确定结果（置信度记为 1.0），其余交给 CNN
+        matches = self.templates.match(images)
+        missing = [i for i, match in enumerate(matches) if match is None]
+        results = [(match, 1.0) for match in matches]
+        if missing:
+            predicted, confidences = self._detect_cards([images[i] for i in missing])
+            for i, predicted_class, confidence in zip(missing, predicted, confidences):
+                results[i] = (predicted_class, confidence)
+        return [result[0] for result in results], [result[1] for result in results]
+
+    def _detect_cards(self, images):
+        if self.multihead:
+            predicted, confidences, _, _ = self._detect_multihead(images)
+            return predicted, confidences
+        return self.cnn.detect_batch(images)
+
     def detect_images_background(self, image1, image2):
-        futures = [self.executor.submit(self.detect_image_with_background, (img, idx)) for idx, img in
-                   enumerate([image1, image2])]
-        results = [future.result() for future in futures]
-        index1, predicted_class1, confidence1 = results[0]
-        index2, predicted_class2, confidence2 = results[1]
+        (predicted_class1, predicted_class2), (confidence1, confidence2) = self.detect_backgrounds([image1, image2])
         return predicted_class1, confidence1, predicted_class2, confidence2
+
+    def detect_backgrounds(self, images):
+        """任意张截图一次判断背景，返回 (类别列表, 置信度列表)"""
+        if self.multihead:
+            _, _, predicted, confidences = self._detect_multihead(images)
+            return predicted, confidences
+        return self.cnn_3.detect_batch(images)
+
+    def cache_stats(self):
+        """识别结果缓存的统计，没有启用缓存时返回空列表"""
+        if self.multihead:
+            return []
+        return [(name, model.cache.stats()) for name, model in [('牌面', self.cnn), ('背景', self.cnn_3)]
+                if model.cache is not None]
+
+    def cascade_stats(self):
+        """背景判断级联的统计，没有启用级联时返回 None"""
+        if self.multihead or self.cnn_3.tiny_model is None:
+            return None
+        return self.cnn_3.cascade_stats()
+
+    def template_stats(self):
+        return self.templates.stats() if self.templates else None
+
+    def close_frame_source(self):
+        # 截图会话属于游戏线程，需在游戏线程中关闭
+        self.frame_source.close()
+
     def stop(self):
-        self.executor.shutdown(wait=True)
+        # 识别在游戏线程内同步批量完成，没有需要关闭的线程池
+        pass
@@ -0,0 +1,56 @@
+# inference_backend.py
+# TorchScript / ONNX Runtime 推理后端，与 nn.Module 一样调用：输入批次张量，返回 logits 张量
+import torch
+
+RUNTIMES = ('eager', 'torchscript', 'onnx', 'int8')
+RUNTIME_SUFFIXES = {'torchscript': '.ts.pt', 'onnx': '.onnx', 'int8': '.int8.pt'}
+# 只能在 CPU 上运行的后端
+CPU_RUNTIMES = ('onnx', 'int8')
+
+
+def runtime_model_path(model_path, runtime):
+    """export_models.py / quantize_models.py 在 .pth 旁边导出同名的 .ts.pt / .onnx / .int8.pt"""
+    if runtime == 'eager' or not model_path.endswith('.pth'):
+        return model_path
+    return model_path[:-len('.pth')] + RUNTIME_SUFFIXES[runtime]
+
+
+class TorchScriptBackend:
+    # 导出的模型来自 FusedPokerCNN 或自带归一化的量化模型，输入均为未归一化的 [0, 1] RGB
+    normalized_input = False
+
+    def __init__(self, model_path, device):
+        self.model = torch.jit.load(model_path, map_location=device)
+        self.model.eval()
+
+    def __call__(self, batch):
+        return self.model(batch)
+
+
+class OnnxBackend:
+    normalized_input = False
+
+    def __init__(self, model_path):
+        import onnxruntime
+
+        # 线程数跟随 runtime_profile.py 设置的 PyTorch 线程数，避免两套线程池各占满所有核心
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = torch.get_num_threads()
+        options.inter_op_num_threads = 1
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, batch):
+        # 预处理缓冲区本来就是 numpy 内存，进出都不拷贝
+        return torch.from_numpy(self.session.run(None, {self.input_name: batch.numpy()})[0])
+
+
+def load_backend(model_path, runtime, device):
+    path = runtime_model_path(model_path, runtime)
+    # .pt 一律是 TorchScript，量化模型也按 TorchScript 加载
+    if runtime in ('torchscript', 'int8') or path.endswith('.pt'):
+        return TorchScriptBackend(path, device)
+    if runtime == 'onnx':
+        return OnnxBackend(path)
+    raise ValueError(f"不支持的推理后端: {runtime}，可选: {', '.join(RUNTIMES)}")
@@ -0,0 +1,178 @@
+# input_backend.py
+# 下注按键的输入方式：Windows 原生 SendInput（按下和抬起一次提交）、pyautogui（不带固定延时）、只记录不按键的演练模式；
+# 热键在创建时一次解析成按键码，下注时只查表
+import argparse
+import ctypes
+import sys
+import time
+
+from latency_tracer import LatencyTracer
+
+# 与 pyautogui 的键名一致
+VK_CODES = {
+    'backspace': 0x08, 'tab': 0x09, 'enter': 0x0D, 'return': 0x0D, 'esc': 0x1B, 'escape': 0x1B, 'space': 0x20,
+    'pageup': 0x21, 'pagedown': 0x22, 'end': 0x23, 'home': 0x24,
+    'left': 0x25, 'up': 0x26, 'right': 0x27, 'down': 0x28, 'insert': 0x2D, 'delete': 0x2E,
+    'multiply': 0x6A, 'add': 0x6B, 'subtract': 0x6D, 'decimal': 0x6E, 'divide': 0x6F,
+}
+VK_CODES.update({str(i): 0x30 + i for i in range(10)})
+VK_CODES.update({chr(ord('a') + i): 0x41 + i for i in range(26)})
+VK_CODES.update({f'num{i}': 0x60 + i for i in range(10)})
+VK_CODES.update({f'f{i}': 0x6F + i for i in range(1, 25)})
+
+# 方向键等需要带扩展键标志
+EXTENDED_KEYS = {0x21, 0x22, 0x23, 0x24, 0x25, 0x26, 0x27, 0x28, 0x2D, 0x2E, 0x6F}
+
+
+class InputBackend:
+    """prepare() 在启动时解析热键，未知的键直接报错；press() 只查表并发送"""
+    name = ''
+
+    def __init__(self):
+        self.codes = {}
+
+    def resolve(self, key):
+        raise NotImplementedError
+
+    def prepare(self, keys):
+        for key in keys:
+            if key and key not in self.codes:
+                self.codes[key] = self.resolve(key)
+        return self
+
+    def press(self, key):
+        self.send(self.codes[key])
+
+    def send(self, code):
+        raise NotImplementedError
+
+
+class SendInputBackend(InputBackend):
+    """Windows 原生按键，预先构建按下、抬起两个事件，一次 SendInput 调用提交"""
+    name = 'sendinput'
+
+    def __init__(self):
+        super().__init__()
+        from ctypes import wintypes
+
+        class KEYBDINPUT(ctypes.Structure):
+            _fields_ = [('wVk', wintypes.WORD), ('wScan', wintypes.WORD), ('dwFlags', wintypes.DWORD),
+                        ('time', wintypes.DWORD), ('dwExtraInfo', ctypes.c_size_t)]
+
+        class MOUSEINPUT(ctypes.Structure):
+            _fields_ = [('dx', wintypes.LONG), ('dy', wintypes.LONG), ('mouseData', wintypes.DWORD),
+                        ('dwFlags', wintypes.DWORD), ('time', wintypes.DWORD), ('dwExtraInfo', ctypes.c_size_t)]
+
+        class INPUTUNION(ctypes.Union):
+            # 联合体的大小须与系统定义一致，否则 SendInput 会拒绝
+            _fields_ = [('ki', KEYBDINPUT), ('mi', MOUSEINPUT)]
+
+        class INPUT(ctypes.Structure):
+            _fields_ = [('type', wintypes.DWORD), ('union', INPUTUNION)]
+
+        self.input_type = INPUT
+        self.user32 = ctypes.WinDLL('user32', use_last_error=True)
+        self.user32.SendInput.argtypes = (wintypes.UINT, ctypes.POINTER(INPUT), ctypes.c_int)
+        self.user32.SendInput.restype = wintypes.UINT
+        self.user32.VkKeyScanW.argtypes = (wintypes.WCHAR,)
+        self.user32.VkKeyScanW.restype = ctypes.c_short
+        self.user32.MapVirtualKeyW.argtypes = (wintypes.UINT, wintypes.UINT)
+        self.user32.MapVirtualKeyW.restype = wintypes.UINT
+
+    def resolve(self, key):
+        vk = VK_CODES.get(key.lower())
+        if vk is None and len(key) == 1:
+            scan = self.user32.VkKeyScanW(key)
+            # 高字节非 0 表示需要 Shift 等组合键，热键不支持
+            if scan != -1 and not (scan >> 8) & 0xFF:
+                vk = scan & 0xFF
+        if vk is None:
+            raise ValueError(f"无法解析的热键: {key}")
+        flags = 0x0001 if vk in EXTENDED_KEYS else 0  # KEYEVENTF_EXTENDEDKEY
+        scan_code = self.user32.MapVirtualKeyW(vk, 0)  # MAPVK_VK_TO_VSC
+        events = (self.input_type * 2)()
+        for event, up in zip(events, (0, 0x0002)):  # KEYEVENTF_KEYUP
+            event.type = 1  # INPUT_KEYBOARD
+            event.union.ki.wVk = vk
+            event.union.ki.wScan = scan_code
+            event.union.ki.dwFlags = flags | up
+        return events
+
+    def send(self, events):
+        if self.user32.SendInput(2, events, ctypes.sizeof(self.input_type)) != 2:
+            raise ctypes.WinError(ctypes.get_last_error())
+
+
+class PyAutoGuiBackend(InputBackend):
+    """原来的 pyautogui 按键，去掉每次调用后的 PAUSE 休眠"""
+    name = 'pyautogui'
+
+    def __init__(self):
+        super().__init__()
+        import pyautogui
+
+        self.pyautogui = pyautogui
+
+    def resolve(self, key):
+        key = key.lower()
+        if not self.pyautogui.isValidKey(key):
+            raise ValueError(f"无法解析的热键: {key}")
+        return key
+
+    def send(self, key):
+        self.pyautogui.press(key, _pause=False)
+
+
+class RecordingBackend(InputBackend):
+    """不按键，只记录 (时刻, 热键)，用于演练、回放和流水线的推理进程"""
+    name = 'record'
+
+    def __init__(self):
+        super().__init__()
+        self.presses = []
+
+    def resolve(self, key):
+        return key
+
+    def send(self, key):
+        self.presses.append((time.time(), key))
+
+
+INPUT_BACKENDS = {
+    SendInputBackend.name: SendInputBackend,
+    PyAutoGuiBackend.name: PyAutoGuiBackend,
+    RecordingBackend.name: RecordingBackend,
+}
+
+
+def create_input_backend(name='auto'):
+    """auto：Windows 用 SendInput，其他系统用 pyautogui"""
+    if name == 'auto':
+        name = SendInputBackend.name if sys.platform == 'win32' else PyAutoGuiBackend.name
+    if name not in INPUT_BACKENDS:
+        raise ValueError(f"不支持的按键方式: {name}，可选: auto, {', '.join(INPUT_BACKENDS)}")
+    return INPUT_BACKENDS[name]()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='测量单次按键的耗时分位数；真实按键会发送到当前焦点窗口')
+    parser.add_argument('--backend', default='record', help='auto / sendinput / pyautogui / record')
+    parser.add_argument('--key', default='f13', help='测试用的热键，默认 f13 一般没有程序响应')
+    parser.add_argument('--count', type=int, default=200)
+    parser.add_argument('--interval', type=float, default=0.01, help='两次按键之间的间隔秒数')
+    args = parser.parse_args()
+
+    backend = create_input_backend(args.backend).prepare([args.key])
+    tracer = LatencyTracer()
+    for _ in range(args.count):
+        start = tracer.now()
+        backend.press(args.key)
+        tracer.record(backend.name, start)
+        time.sleep(args.interval)
+    stats = tracer.snapshot()[backend.name]
+    print(f"{backend.name} 按键 {stats['count']} 次: p50 {stats['p50_ms']:.3f}  p95 {stats['p95_ms']:.3f}  "
+          f"p99 {stats['p99_ms']:.3f}  最大 {stats['max_ms']:.3f} 毫秒")
+
+
+if __name__ == '__main__':
+    main()
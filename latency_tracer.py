@@ -0,0 +1,117 @@
+# latency_tracer.py
+# 基于 perf_counter_ns 的分阶段耗时统计：每个阶段一个对数分桶直方图，常数内存，可随时取 p50/p95/p99
+import json
+import threading
+import time
+
+# 每个 2 的幂区间再分 64 个子桶，相对误差不超过约 1.6%
+SUB_BUCKET_BITS = 6
+
+
+class LatencyHistogram:
+    """HDR 风格的流式直方图，记录纳秒耗时"""
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    @staticmethod
+    def bucket(value):
+        shift = max(value.bit_length() - SUB_BUCKET_BITS, 0)
+        return shift, value >> shift
+
+    @staticmethod
+    def bucket_value(bucket):
+        # 取桶的中点作为代表值
+        shift, sub = bucket
+        return (sub << shift) + ((1 << shift) >> 1)
+
+    def record(self, value):
+        value = max(int(value), 0)
+        key = self.bucket(value)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = max(self.max, value)
+
+    def percentile(self, q):
+        if not self.count:
+            return 0
+        target = q / 100.0 * self.count
+        seen = 0
+        for key in sorted(self.counts):
+            seen += self.counts[key]
+            if seen >= target:
+                return min(self.bucket_value(key), self.max)
+        return self.max
+
+    def summary(self):
+        """毫秒为单位的统计"""
+        return {
+            'count': self.count,
+            'min_ms': (self.min or 0) / 1e6,
+            'mean_ms': self.total / self.count / 1e6 if self.count else 0.0,
+            'p50_ms': self.percentile(50) / 1e6,
+            'p95_ms': self.percentile(95) / 1e6,
+            'p99_ms': self.percentile(99) / 1e6,
+            'max_ms': self.max / 1e6,
+        }
+
+
+class LatencyTracer:
+    """按阶段名记录耗时；dump_interval 秒大于 0 时定期写入 JSON 文件"""
+
+    def __init__(self, path='latency.json', dump_interval=0.0):
+        self.path = path
+        self.dump_interval = dump_interval
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self._last_dump = time.monotonic()
+
+    @staticmethod
+    def now():
+        return time.perf_counter_ns()
+
+    def record(self, name, start_ns, end_ns=None):
+        """记录从 start_ns 到 end_ns（默认当前时刻）的耗时，返回结束时刻"""
+        end_ns = time.perf_counter_ns() if end_ns is None else end_ns
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram()
+            histogram.record(end_ns - start_ns)
+        return end_ns
+
+    def snapshot(self):
+        with self._lock:
+            return {name: histogram.summary() for name, histogram in self.histograms.items()}
+
+    def format(self, names=None):
+        """一行文字的摘要，用于周期报告"""
+        snapshot = self.snapshot()
+        return '  '.join(f"{name} p50 {stats['p50_ms']:.2f} p95 {stats['p95_ms']:.2f} p99 {stats['p99_ms']:.2f}"
+                         for name, stats in snapshot.items() if names is None or name in names)
+
+    def dump(self, path=None):
+        path = path or self.path
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'time': time.time(), 'spans': self.snapshot()}, f, ensure_ascii=False, indent=2)
+        return path
+
+    def maybe_dump(self):
+        """每帧调用，到达间隔时写一次文件"""
+        if self.dump_interval <= 0:
+            return None
+        now = time.monotonic()
+        if now - self._last_dump < self.dump_interval:
+            return None
+        self._last_dump = now
+        return self.dump()
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
@@ -0,0 +1,146 @@
+# log_pipeline.py
+# 非阻塞日志：调用线程只做限流判断并把 (时间, 类型, 模板, 参数) 放进队列，
+# 后台线程负责格式化、写日志文件，并把一批日志一次性交给界面
+import logging
+import threading
+import time
+from collections import deque
+
+
+def parse_rate_limits(text):
+    """'unsure:5,timing:10' -> {'unsure': 5.0, 'timing': 10.0}，单位为每秒条数"""
+    limits = {}
+    for part in text.split(','):
+        if part.strip():
+            kind, rate = part.split(':')
+            limits[kind.strip()] = float(rate)
+    return limits
+
+
+class RateLimiter:
+    """按类型的令牌桶，桶容量为一秒的配额；rate_limits 中没有的类型不限流，被拒绝的按类型计数"""
+
+    def __init__(self, rate_limits=None):
+        self.rate_limits = rate_limits or {}
+        # 每种类型的 [剩余令牌, 上次补充时刻]
+        self.buckets = {kind: [rate, time.monotonic()] for kind, rate in self.rate_limits.items()}
+        self.dropped = {}
+
+    def allow(self, kind):
+        """调用方负责加锁"""
+        bucket = self.buckets.get(kind)
+        if bucket is None:
+            return True
+        now = time.monotonic()
+        rate = self.rate_limits[kind]
+        bucket[0] = min(rate, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if bucket[0] < 1:
+            self.drop(kind)
+            return False
+        bucket[0] -= 1
+        return True
+
+    def drop(self, kind):
+        self.dropped[kind] = self.dropped.get(kind, 0) + 1
+
+
+class LogPipeline:
+    """按类型令牌桶限流，超出速率或队列已满的日志直接丢弃并计数；rate_limits 中没有的类型不限流"""
+
+    def __init__(self, gui_callback=None, rate_limits=None, max_queue=10000, flush_interval=0.05,
+                 logger=None, drop_report_interval=10.0):
+        self.gui_callback = gui_callback
+        self.limiter = RateLimiter(rate_limits)
+        self.rate_limits = self.limiter.rate_limits
+        self.dropped = self.limiter.dropped
+        self.max_queue = max_queue
+        self.flush_interval = flush_interval
+        self.logger = logger or logging.getLogger()
+        self.drop_report_interval = drop_report_interval
+        self.records = deque()
+        self.emitted = 0
+        self.written = 0
+        self._reported_drops = 0
+        self._last_drop_report = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._consume, name='log-pipeline', daemon=True)
+        self._thread.start()
+
+    def emit(self, kind, template, *args):
+        """args 不为空时由后台线程执行 template.format(*args)；返回是否入队"""
+        with self._lock:
+            if not self.limiter.allow(kind):
+                return False
+            if len(self.records) >= self.max_queue:
+                self.limiter.drop(kind)
+                return False
+            self.emitted += 1
+        self.records.append((time.time(), template, args))
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                'emitted': self.emitted,
+                'written': self.written,
+                'queued': len(self.records),
+                'dropped': dict(self.dropped),
+            }
+
+    def format(self):
+        """一行文字的摘要，用于周期报告"""
+        stats = self.stats()
+        dropped = '  '.join(f"{kind} {count}" for kind, count in stats['dropped'].items())
+        return (f"入队 {stats['emitted']} 已写出 {stats['written']} 排队 {stats['queued']} "
+                f"丢弃 {sum(stats['dropped'].values())}" + (f" ({dropped})" if dropped else ''))
+
+    def _write(self, created, message):
+        # 保留入队时刻作为日志时间
+        record = self.logger.makeRecord(self.logger.name, logging.INFO, '', 0, message, None, None)
+        record.created = created
+        record.msecs = (created - int(created)) * 1000
+        self.logger.handle(record)
+
+    def _report_drops(self):
+        now = time.monotonic()
+        if now - self._last_drop_report < self.drop_report_interval:
+            return
+        self._last_drop_report = now
+        with self._lock:
+            total = sum(self.dropped.values())
+            dropped = dict(self.dropped)
+        if total > self._reported_drops:
+            self._reported_drops = total
+            self.records.append((time.time(), "日志限流丢弃 {} 条: {}",
+                                 (total, '  '.join(f"{kind} {count}" for kind, count in dropped.items()))))
+
+    def flush(self):
+        """格式化并写出队列中的全部日志，界面一次只收到一批"""
+        lines = []
+        while self.records:
+            created, template, args = self.records.popleft()
+            try:
+                message = template.format(*args) if args else template
+            except (IndexError, KeyError, ValueError):
+                # 模板与参数不匹配时原样输出，不让后台线程退出
+                message = f"{template} {args}"
+            self._write(created, message)
+            lines.append(message)
+        if lines:
+            with self._lock:
+                self.written += len(lines)
+            if self.gui_callback:
+                self.gui_callback(lines)
+        return len(lines)
+
+    def _consume(self):
+        while not self._stop.wait(self.flush_interval):
+            self._report_drops()
+            self.flush()
+        self.flush()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=1)
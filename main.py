@@ -1,5 +1,7 @@
 import asyncio
+import multiprocessing
 import threading
+import time
 
 from PIL import ImageTk
 import os
@@ -7,9 +9,18 @@ import keyboard
 from tkinter import messagebox
 import configparser
 from game_controller import GameController
+from image_processor import ImageProcessor
+from poll_scheduler import PollScheduler
+from runtime_profile import RuntimeProfile
+from table import Table
+from pipeline import PipelineController
+from latency_tracer import LatencyTracer
+from log_pipeline import LogPipeline, parse_rate_limits
+from input_backend import create_input_backend
+from archive_writer import ArchiveWriter
+from preprocess import to_pil_image
 import logging
 import tkinter as tk
-from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor
 from websocket_server import WebSocketServer
 
@@ -44,11 +55,34 @@ class GUI:
             self.config.set('Settings', 'hotkey_hu', 'num2')
             self.config.set('Settings', 'hotkey_he', 'num3')
             self.config.set('Settings', 'images_path', 'images')
+            self.config.set('Settings', 'card_model_path', 'best_poker_cnn.pth')
+            self.config.set('Settings', 'background_model_path', 'best_poker_cnn_3class.pth')
+            self.config.set('Settings', 'background_cascade_model_path', '')
+            self.config.set('Settings', 'background_cascade_threshold', '0.98')
+            self.config.set('Settings', 'multihead_model_path', '')
+            self.config.set('Settings', 'cache_size', '256')
+            self.config.set('Settings', 'template_index_path', '')
+            self.config.set('Settings', 'template_min_similarity', '0.97')
+            self.config.set('Settings', 'template_min_margin', '0.05')
+            self.config.set('Settings', 'runtime', 'eager')
+            self.config.set('Settings', 'intra_op_threads', '0')
+            self.config.set('Settings', 'inter_op_threads', '0')
+            self.config.set('Settings', 'flush_denormal', 'True')
+            self.config.set('Settings', 'inference_cpus', '')
+            self.config.set('Settings', 'gui_cpus', '')
             with open('config.ini', 'w') as configfile:
                 self.config.write(configfile)
 
         image_folder = self.config.get('Settings', 'images_path')
         os.makedirs(image_folder, exist_ok=True)
+        # 截图存档在后台线程编码写盘：png（压缩级别 0-9）/ webp（无损）/ raw（原始数组），队列满时丢弃
+        self.archive_writer = ArchiveWriter(
+            image_folder,
+            format=self.config.get('Settings', 'archive_format', fallback='png'),
+            level=self.config.getint('Settings', 'archive_png_level', fallback=1),
+            workers=self.config.getint('Settings', 'archive_workers', fallback=2),
+            max_queue=self.config.getint('Settings', 'archive_queue_size', fallback=64),
+            drop_policy=self.config.get('Settings', 'archive_drop_policy', fallback='drop_oldest'))
 
         # 创建和布局控件
         self.create_widgets()
@@ -69,16 +103,29 @@ class GUI:
         self.result_label2.grid(row=8, column=1, padx=10, pady=5)
 
         # 初始化提示信息标签
-        self.hint_label = tk.Label(self.root, text="按'F2'暂停 | 'F3'继续 | 'Esc'停止", justify=tk.LEFT)
+        self.hint_label = tk.Label(self.root, text="按'F2'暂停 | 'F3'继续 | 'F4'保存耗时统计 | 'Esc'停止", justify=tk.LEFT)
         self.hint_label.grid(row=9, column=0, columnspan=4, padx=10, pady=10)
 
         # 初始化游戏控制器实例
         self.game = None
+        self.game_thread = None
+
+        # 日志先入队，由后台线程格式化、写文件并批量刷新到界面；高频类型按每秒条数限流
+        self.log_pipeline = LogPipeline(
+            gui_callback=lambda lines: self.loop.call_soon_threadsafe(self._log_lines, lines),
+            rate_limits=parse_rate_limits(self.config.get('Settings', 'log_rate_limits',
+                                                          fallback='unsure:5,timing:15,round:20,backs:5')))
 
         keyboard.add_hotkey('esc', self.on_esc)
         keyboard.add_hotkey('f2', self.on_f2)
         keyboard.add_hotkey('f3', self.on_f3)
+        keyboard.add_hotkey('f4', self.on_f4)
+        # 推理线程数需在加载模型之前设置，runtime_profile.py 可测出本机的推荐值
+        self.runtime_profile = RuntimeProfile.from_config(self.config)
+        self.log(f"推理运行配置: {self.runtime_profile.apply()}")
+        self.runtime_profile.pin_gui_thread()
         self.executor = ThreadPoolExecutor(max_workers=5)
+        self.executor.submit(self.preload_models)
         self.websocket_server = WebSocketServer(logger=None,loop=self.loop)
         # 启动 WebSocket 服务器
         # self.start_websocket_server()
@@ -91,11 +138,26 @@ class GUI:
     def on_esc(self):
         if self.game is not None:
             self.game.stop()
+            self.log(f"截图存档: {self.archive_writer.format_stats()}")
         # 禁用启动按钮
         # 游戏结束后启用启动按钮
         self._enable_start_button()
         self.game=None
 
+    def on_close(self):
+        # 先停止游戏线程，再等存档队列写完，否则退出时队列中的截图会丢失
+        if self.game is not None:
+            self.game.stop()
+            self.game = None
+        if self.game_thread is not None:
+            self.game_thread.join(timeout=5)
+        self.archive_writer.stop()
+        self.log(f"截图存档: {self.archive_writer.format_stats()}")
+        # 日志管道最后停止，排队中的日志全部写入文件；窗口即将关闭，不再刷新到界面
+        self.log_pipeline.gui_callback = None
+        self.log_pipeline.stop()
+        self.root.destroy()
+
     def on_f2(self):
         if self.game is not None:
             self.game.pause()
@@ -104,6 +166,11 @@ class GUI:
         if self.game is not None:
             self.game.resume()
 
+    def on_f4(self):
+        if self.game is not None:
+            self.log(f"耗时统计已保存: {self.game.dump_latency()}")
+        self.log(f"截图存档: {self.archive_writer.format_stats()}")
+
     def create_widgets(self):
         # 选择截图区域按钮
         self.select_region_button = tk.Button(self.root, text="选择截图区域", command=self.select_screenshot_region)
@@ -163,13 +230,12 @@ class GUI:
         self.start_button.grid(row=5, column=0, columnspan=4, pady=10)
 
     def log(self, message):
-        # 将日志消息发送到日志记录器
-        self.loop.call_soon_threadsafe(self._log, message)
+        # 将日志消息发送到日志管道
+        self.log_pipeline.emit('gui', message)
 
-    def _log(self, message):
-        # 将日志消息发送到日志记录器
-        logging.info(message)
-        self.log_text.insert(tk.END, message + "\n")
+    def _log_lines(self, messages):
+        # 一批日志只插入一次
+        self.log_text.insert(tk.END, "\n".join(messages) + "\n")
         self.log_text.see(tk.END)
 
         # 限制日志条数，例如保留最近的500条
@@ -179,9 +245,17 @@ class GUI:
 
 
     def update_image(self, image1, image2, poker1, poker2):
+        # 存档只入队，不等待编码写盘
+        if poker1 and poker2:
+            self.archive_writer.submit(image1, image2, poker1.num, poker2.num)
+        else:
+            self.archive_writer.submit(image1, image2)
         self.loop.call_soon_threadsafe(self._update_image, image1, image2, poker1, poker2)
 
     def _update_image(self, image1, image2, poker1, poker2):
+        # 游戏线程传来的是 BGRA 截图数组，在这里才转为 PIL 图片
+        image1 = to_pil_image(image1)
+        image2 = to_pil_image(image2)
         photo1 = ImageTk.PhotoImage(image1)
         photo2 = ImageTk.PhotoImage(image2)
 
@@ -193,38 +267,39 @@ class GUI:
 
         self.result_label1.config(text=f"龙: {poker1.card if poker1 else '?'}")
         self.result_label2.config(text=f"虎: {poker2.card if poker2 else '?'}")
-        if poker1 and poker2:
-            now = datetime.now()
-            image_folder = self.config.get('Settings', 'images_path')
-            # 格式化日期和时间
-            date_str = now.strftime("%Y%m%d")
-            hour_str = now.strftime("%H")
-            formatted_time = now.strftime("%Y%m%d%H%M%S.%f")[:-3]
-            # 创建子文件夹路径
-            subfolder_path = os.path.join(image_folder, date_str, hour_str)
-            # 检查并创建子文件夹
-            os.makedirs(subfolder_path, exist_ok=True)
-            # 保存图片到子文件夹
-            image_path1 = os.path.join(subfolder_path, f"{formatted_time}_{poker1.num}_龙.png")
-            image1.save(image_path1)
-            image_path2 = os.path.join(subfolder_path, f"{formatted_time}_{poker2.num}_虎.png")
-            image2.save(image_path2)
-        else:
-            now = datetime.now()
-            image_folder = self.config.get('Settings', 'images_path')
-            # 格式化日期和时间
-            date_str = now.strftime("%Y%m%d")
-            hour_str = now.strftime("%H")
-            formatted_time = now.strftime("%Y%m%d%H%M%S.%f")[:-3]
-            # 创建子文件夹路径
-            subfolder_path = os.path.join(image_folder, date_str, hour_str)
-            # 检查并创建子文件夹
-            os.makedirs(subfolder_path, exist_ok=True)
-            # 保存图片到子文件夹
-            image_path1 = os.path.join(subfolder_path, f"{formatted_time}_龙.png")
-            image1.save(image_path1)
-            image_path2 = os.path.join(subfolder_path, f"{formatted_time}_虎.png")
-            image2.save(image_path2)
+
+    def model_options(self):
+        """识别模型的配置，后台预加载与启动游戏共用"""
+        return {
+            # 可换成 model_optimizer.py 导出的优化版模型
+            'card_model_path': self.config.get('Settings', 'card_model_path', fallback='best_poker_cnn.pth'),
+            'background_model_path': self.config.get('Settings', 'background_model_path', fallback='best_poker_cnn_3class.pth'),
+            # 低分辨率背景小模型（train_cnn_3class.py --tiny 训练），置信度低于阈值时再运行完整模型
+            'background_cascade_model_path': self.config.get('Settings', 'background_cascade_model_path', fallback=''),
+            'background_cascade_threshold': self.config.getfloat('Settings', 'background_cascade_threshold', fallback=0.98),
+            # 配置了多头模型时用一个网络同时判断背景和识别牌面
+            'multihead_model_path': self.config.get('Settings', 'multihead_model_path', fallback=''),
+            # 推理后端：eager / torchscript / onnx / int8，需先运行 export_models.py 或 quantize_models.py
+            'runtime': self.config.get('Settings', 'runtime', fallback='eager'),
+            # 识别结果缓存条数，0 为不缓存
+            'cache_size': self.config.getint('Settings', 'cache_size', fallback=256),
+            # 牌面模板索引（template_matcher.py build 生成），为空则不使用
+            'template_index_path': self.config.get('Settings', 'template_index_path', fallback=''),
+            'template_min_similarity': self.config.getfloat('Settings', 'template_min_similarity', fallback=0.97),
+            'template_min_margin': self.config.getfloat('Settings', 'template_min_margin', fallback=0.05),
+        }
+
+    def preload_models(self):
+        # 启动界面时在后台加载并预热模型，点击启动后直接复用
+        start = time.perf_counter()
+        # 预加载线程由界面线程创建，先按推理核心重新绑核（Linux 下预热时创建的推理线程池继承该设置）
+        self.runtime_profile.pin_inference_thread()
+        try:
+            ImageProcessor.load_models(**self.model_options())
+        except Exception as e:
+            self.log(f"模型预加载失败: {e}")
+            return
+        self.log(f"模型预加载完成 耗时 {time.perf_counter() - start:.2f} 秒")
 
     def start_game(self):
         if self.game is not None:
@@ -253,18 +328,61 @@ class GUI:
             with open('config.ini', 'w') as configfile:
                 self.config.write(configfile)
 
+            # 像素统计的抽样步长，1 为逐像素统计
+            stats_stride = self.config.getint('Settings', 'stats_stride', fallback=1)
+            # 画面变化阈值，区域缩略图的最大像素差不超过该值视为画面未变化
+            change_threshold = self.config.getint('Settings', 'change_threshold', fallback=8)
+            # 截图频率：无牌 / 看到牌背 / 开牌，0 为不限速
+            scheduler = PollScheduler(
+                idle_fps=self.config.getfloat('Settings', 'poll_idle_fps', fallback=10.0),
+                backs_fps=self.config.getfloat('Settings', 'poll_backs_fps', fallback=30.0),
+                reveal_fps=self.config.getfloat('Settings', 'poll_reveal_fps', fallback=0.0),
+                frame_budget_ms=self.config.getfloat('Settings', 'frame_budget_ms', fallback=30.0))
+            # 同一次开牌融合最近 fusion_window 帧的识别结果，越早的帧乘 fusion_decay 衰减；1 为只看当前帧
+            fusion_window = self.config.getint('Settings', 'fusion_window', fallback=1)
+            fusion_decay = self.config.getfloat('Settings', 'fusion_decay', fallback=0.8)
+            # 配置了 [table1]、[table2] … 时进入多桌模式，所有牌桌共用一次截图和批量推理
+            tables = [Table.from_config(self.config, section, change_threshold, fusion_window, fusion_decay)
+                      for section in Table.config_sections(self.config)]
+            if tables:
+                self.log(f"多桌模式: {', '.join(table.name for table in tables)}")
+
+            # 各阶段耗时直方图，按 F4 或每隔 latency_dump_interval 秒写入文件，0 为只在按 F4 时写入
+            tracer = LatencyTracer(self.config.get('Settings', 'latency_path', fallback='latency.json'),
+                                   self.config.getfloat('Settings', 'latency_dump_interval', fallback=60.0))
+
+            # 下注按键方式：auto / sendinput / pyautogui / record（只记录不按键）
+            input_backend = create_input_backend(self.config.get('Settings', 'input_backend', fallback='auto'))
+
+            # 流水线模式：截图和推理放到独立进程，0 为不启用
+            pipeline_workers = self.config.getint('Settings', 'pipeline_workers', fallback=0)
+
             # 创建游戏控制器实例
-            self.game = GameController(x=x, y=y, width=width, distance=distance, hotkey_long=hotkey_long, hotkey_hu=hotkey_hu, hotkey_he=hotkey_he, log_callback=self.log, update_image_callback=self.update_image, websocket_server=self.websocket_server)
+            if pipeline_workers > 0:
+                tables = tables or [Table('', x, y, width, distance, hotkey_long, hotkey_hu, hotkey_he, change_threshold,
+                                          fusion_window, fusion_decay)]
+                self.game = PipelineController(
+                    tables, log_callback=self.log, update_image_callback=self.update_image,
+                    model_options=self.model_options(), runtime_profile=self.runtime_profile, stats_stride=stats_stride,
+                    workers=pipeline_workers,
+                    queue_size=self.config.getint('Settings', 'pipeline_queue_size', fallback=2),
+                    # 推理跟不上时丢最早的帧（drop_oldest）或丢新来的帧（drop_newest）
+                    drop_policy=self.config.get('Settings', 'pipeline_drop_policy', fallback='drop_oldest'),
+                    # 截图进程按 poll_idle_fps / poll_backs_fps / poll_reveal_fps 切换频率
+                    scheduler=scheduler,
+                    tracer=tracer, log_pipeline=self.log_pipeline, input_backend=input_backend)
+            else:
+                self.game = GameController(x=x, y=y, width=width, distance=distance, hotkey_long=hotkey_long, hotkey_hu=hotkey_hu, hotkey_he=hotkey_he, log_callback=self.log, update_image_callback=self.update_image, websocket_server=self.websocket_server, stats_stride=stats_stride, change_threshold=change_threshold, scheduler=scheduler, model_options=self.model_options(), runtime_profile=self.runtime_profile, tables=tables, tracer=tracer, log_pipeline=self.log_pipeline, input_backend=input_backend, fusion_window=fusion_window, fusion_decay=fusion_decay)
 
             # 禁用启动按钮
             self.start_button.config(state=tk.DISABLED)
 
             # 使用线程运行游戏控制器
-            game_thread = threading.Thread(target=self.run_game)
-            game_thread.daemon = True
-            game_thread.start()
-        except ValueError:
-            messagebox.showerror("输入错误", "请确保 X、Y、宽度和距离是整数")
+            self.game_thread = threading.Thread(target=self.run_game)
+            self.game_thread.daemon = True
+            self.game_thread.start()
+        except ValueError as e:
+            messagebox.showerror("输入错误", f"请确保 X、Y、宽度和距离是整数，热键有效\n{e}")
 
     def run_game(self):
         # 使用 fallback 参数设置默认值
@@ -332,6 +450,7 @@ def main():
 
     root = tk.Tk()
     app = GUI(root, loop)
+    root.protocol("WM_DELETE_WINDOW", app.on_close)
 
     def run_asyncio():
         loop.run_forever()
@@ -345,4 +464,6 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
+    # 流水线模式的子进程在打包后的程序中也能启动
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,114 @@
+# model_optimizer.py
+# 导出推理优化版模型：Normalize 和 BatchNorm 折叠进卷积，去掉 Dropout
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+from poker_cnn import PokerCNN
+from poker_cnn_3class import PokerCNN3Class
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+class FusedPokerCNN(nn.Module):
+    """PokerCNN / PokerCNN3Class 的推理版，输入为未归一化的 [0, 1] RGB"""
+
+    normalized_input = False
+
+    def __init__(self, num_classes=52, input_size=64):
+        super(FusedPokerCNN, self).__init__()
+        self.conv1 = nn.Conv2d(3, 32, kernel_size=3, padding=1, bias=False)
+        # 折叠 Normalize 后零填充的边缘与原模型不同，偏置随位置变化
+        self.register_buffer('conv1_bias', torch.zeros(1, 32, input_size, input_size))
+        self.conv2 = nn.Conv2d(32, 64, kernel_size=3, padding=1)
+        self.conv3 = nn.Conv2d(64, 128, kernel_size=3, padding=1)
+        self.conv4 = nn.Conv2d(128, 256, kernel_size=3, padding=1)
+        self.fc1 = nn.Linear(256 * 4 * 4, 512)
+        self.fc2 = nn.Linear(512, num_classes)
+
+    def forward(self, x):
+        # ReLU 与最大池化可交换，先池化再原地 ReLU，只处理四分之一的数据
+        x = torch.relu_(F.max_pool2d(self.conv1(x).add_(self.conv1_bias), 2))
+        x = torch.relu_(F.max_pool2d(self.conv2(x), 2))
+        x = torch.relu_(F.max_pool2d(self.conv3(x), 2))
+        x = torch.relu_(F.max_pool2d(self.conv4(x), 2))
+        x = x.flatten(1)
+        x = torch.relu_(self.fc1(x))
+        return self.fc2(x)
+
+
+def bn_scale_shift(bn):
+    scale = bn.weight / torch.sqrt(bn.running_var + bn.eps)
+    shift = bn.bias - bn.running_mean * scale
+    return scale, shift
+
+
+@torch.no_grad()
+def fuse_model(model, input_size=64, mean=IMAGENET_MEAN, std=IMAGENET_STD):
+    """把 PokerCNN / PokerCNN3Class 转为 FusedPokerCNN"""
+    model = model.eval()
+    fused = FusedPokerCNN(num_classes=model.fc2.out_features, input_size=input_size)
+    mean = torch.tensor(mean).view(1, 3, 1, 1)
+    std = torch.tensor(std).view(1, 3, 1, 1)
+
+    # conv1: 输入 (x - mean) / std 折叠进权重；原模型在归一化空间补零，
+    # 相当于原始空间补 mean，边缘差值与输入无关，预先算成随位置变化的偏置
+    scale, shift = bn_scale_shift(model.bn1)
+    weight = model.conv1.weight / std
+    border = F.conv2d((-mean / std).expand(1, 3, input_size, input_size), model.conv1.weight, padding=1)
+    bias = border + model.conv1.bias.view(1, -1, 1, 1)
+    fused.conv1.weight.copy_(weight * scale.view(-1, 1, 1, 1))
+    fused.conv1_bias.copy_(bias * scale.view(1, -1, 1, 1) + shift.view(1, -1, 1, 1))
+
+    # conv2-4: BatchNorm 折叠进卷积
+    for name, bn_name in [('conv2', 'bn2'), ('conv3', 'bn3'), ('conv4', 'bn4')]:
+        conv = getattr(model, name)
+        scale, shift = bn_scale_shift(getattr(model, bn_name))
+        getattr(fused, name).weight.copy_(conv.weight * scale.view(-1, 1, 1, 1))
+        getattr(fused, name).bias.copy_(conv.bias * scale + shift)
+
+    fused.fc1.load_state_dict(model.fc1.state_dict())
+    fused.fc2.load_state_dict(model.fc2.state_dict())
+    return fused.eval()
+
+
+@torch.no_grad()
+def verify_fused(model, fused, samples=32, input_size=64, atol=1e-4, mean=IMAGENET_MEAN, std=IMAGENET_STD):
+    """随机输入比较原模型与优化模型的输出，返回最大误差，不一致时抛出异常"""
+    x = torch.rand(samples, 3, input_size, input_size)
+    normalized = (x - torch.tensor(mean).view(1, 3, 1, 1)) / torch.tensor(std).view(1, 3, 1, 1)
+    expected = model.eval()(normalized)
+    actual = fused.eval()(x)
+    max_error = (expected - actual).abs().max().item()
+    if max_error > atol or not torch.equal(expected.argmax(1), actual.argmax(1)):
+        raise ValueError(f"优化模型输出与原模型不一致，最大误差 {max_error:.2e}")
+    return max_error
+
+
+def save_fused(fused, path):
+    torch.save({'format': 'fused', 'num_classes': fused.fc2.out_features, 'state_dict': fused.state_dict()}, path)
+
+
+def load_fused(checkpoint):
+    model = FusedPokerCNN(num_classes=checkpoint['num_classes'])
+    model.load_state_dict(checkpoint['state_dict'])
+    return model.eval()
+
+
+def export(model_class, num_classes, model_path, output_path):
+    model = model_class(num_classes=num_classes)
+    model.load_state_dict(torch.load(model_path, map_location='cpu'))
+    fused = fuse_model(model)
+    max_error = verify_fused(model, fused)
+    save_fused(fused, output_path)
+    print(f"{model_path} -> {output_path}  最大误差: {max_error:.2e}")
+
+
+def main():
+    export(PokerCNN, 52, 'best_poker_cnn.pth', 'best_poker_cnn_fused.pth')
+    export(PokerCNN3Class, 3, 'best_poker_cnn_3class.pth', 'best_poker_cnn_3class_fused.pth')
+
+
+if __name__ == '__main__':
+    main()
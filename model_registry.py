@@ -0,0 +1,41 @@
+# model_registry.py
+import threading
+from concurrent.futures import Future
+
+
+class ModelRegistry:
+    """进程内模型注册表：同一配置的模型只加载一次，加载后预热，供之后的 ImageProcessor 复用"""
+
+    def __init__(self):
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, factory):
+        """返回 key 对应的模型；其他线程正在加载同一模型时等待其完成"""
+        with self._lock:
+            future = self._futures.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._futures[key] = future
+        if owner:
+            try:
+                model = factory()
+                # 首次前向较慢，加载后先跑几次
+                warm_up = getattr(model, 'warm_up', None)
+                if warm_up:
+                    warm_up()
+            except BaseException as e:
+                with self._lock:
+                    del self._futures[key]
+                future.set_exception(e)
+                raise
+            future.set_result(model)
+        return future.result()
+
+    def loaded_keys(self):
+        with self._lock:
+            return [key for key, future in self._futures.items() if future.done() and not future.exception()]
+
+
+registry = ModelRegistry()
@@ -0,0 +1,353 @@
+# pipeline.py
+# 多进程流水线：截图进程把整帧写入共享内存环形缓冲区，推理进程各自负责一部分牌桌，
+# 下注决策、日志和界面图片经结果队列回到主进程，由主进程广播和按键
+import multiprocessing
+import os
+import queue
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from frame_source import FrameSource
+from game_controller import BetActions, GameController
+from latency_tracer import LatencyTracer
+from log_pipeline import RateLimiter
+from input_backend import RecordingBackend, create_input_backend
+from poker_cnn_classifier import Poker
+from poll_scheduler import PollScheduler
+from queue_policy import DROP_POLICIES, put_with_policy
+from screen_capture import ScreenCapture
+
+
+class SharedFrameRing:
+    """共享内存中的 slots 帧环形缓冲区；每个槽位记录写入的帧序号，写入过程中为 -1"""
+
+    def __init__(self, shape, slots=8, name=None):
+        self.shape = tuple(shape)
+        self.slots = slots
+        frame_bytes = int(np.prod(self.shape))
+        header_bytes = 8 * slots
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=header_bytes + frame_bytes * slots)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.name = self.shm.name
+        self.sequences = np.ndarray((slots,), dtype=np.int64, buffer=self.shm.buf)
+        self.frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=self.shm.buf, offset=header_bytes)
+        if self.owner:
+            self.sequences[:] = -1
+
+    def write(self, sequence, frame):
+        slot = sequence % self.slots
+        self.sequences[slot] = -1
+        self.frames[slot] = frame
+        self.sequences[slot] = sequence
+        return slot
+
+    def read_crops(self, sequence, slices):
+        """拷贝出各区域的截图；读取期间槽位被覆盖时返回 None"""
+        slot = sequence % self.slots
+        if self.sequences[slot] != sequence:
+            return None
+        frame = self.frames[slot]
+        crops = [frame[rows, cols].copy() for rows, cols in slices]
+        if self.sequences[slot] != sequence:
+            return None
+        return crops
+
+    def close(self):
+        # 先释放引用共享内存的数组，否则无法关闭
+        self.sequences = self.frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def capture_worker(regions, ring_name, shape, slots, frame_queues, drop_policy, scheduler, poll_states, counters,
+                   paused, stop, runtime_profile=None):
+    """截图进程：按各推理进程中最快的牌局状态控制频率，截取所有牌桌区域的外接矩形，写入环形缓冲区并通知每个推理进程；
+    poll_states 为每个推理进程发布的 PollScheduler.STATES 下标"""
+    # 截图与推理共用推理核心，不占界面的核心
+    if runtime_profile is not None:
+        runtime_profile.pin_inference_thread()
+    capture = ScreenCapture(regions)
+    ring = SharedFrameRing(shape, slots, name=ring_name)
+    sequence = 0
+    try:
+        while not stop.is_set():
+            if paused.is_set():
+                time.sleep(0.05)
+                scheduler.reset()
+                continue
+            scheduler.wait(PollScheduler.STATES[max(poll_state.value for poll_state in poll_states)])
+            frame = capture.grab()
+            if frame.shape != ring.shape:
+                # 缩放比例变化等原因导致尺寸不符时跳过
+                continue
+            ring.write(sequence, frame)
+            with counters['captured'].get_lock():
+                counters['captured'].value += 1
+            for index, frame_queue in enumerate(frame_queues):
+                dropped = put_with_policy(frame_queue, sequence, drop_policy)
+                if dropped:
+                    with counters['dropped'][index].get_lock():
+                        counters['dropped'][index].value += dropped
+            sequence += 1
+    finally:
+        capture.close()
+        ring.close()
+
+
+class RingFrameSource(FrameSource):
+    """推理进程的帧来源：从队列取帧序号，在环形缓冲区中切出本进程负责的牌桌区域"""
+
+    def __init__(self, ring, slices, frame_queue, stale_counter, stop):
+        self.ring = ring
+        self.slices = slices
+        self.frame_queue = frame_queue
+        self.stale_counter = stale_counter
+        self.stop = stop
+
+    def read(self):
+        while not self.stop.is_set():
+            try:
+                sequence = self.frame_queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            crops = self.ring.read_crops(sequence, self.slices)
+            if crops is not None:
+                return crops
+            # 推理太慢，槽位已被新帧覆盖
+            with self.stale_counter.get_lock():
+                self.stale_counter.value += 1
+        return None
+
+
+class QueueLog:
+    """推理进程的日志发送端：先按类型限流，通过的结构化记录交给主进程格式化和输出，
+    超出速率的在本进程丢弃，不再经过进程间队列"""
+
+    def __init__(self, result_queue, rate_limits=None):
+        self.result_queue = result_queue
+        self.limiter = RateLimiter(rate_limits)
+
+    def emit(self, kind, template, *args):
+        # 推理进程只有游戏线程写日志，不需要加锁
+        if not self.limiter.allow(kind):
+            return False
+        self.result_queue.put(('log', kind, template, args))
+        return True
+
+    def format(self):
+        """周期报告中带回本进程的限流丢弃数"""
+        dropped = self.limiter.dropped
+        return (f"推理进程限流丢弃 {sum(dropped.values())}" +
+                (f" ({'  '.join(f'{kind} {count}' for kind, count in dropped.items())})" if dropped else ''))
+
+
+class WorkerGameController(GameController):
+    """推理进程中运行原有的游戏循环，下注交回主进程执行"""
+
+    def __init__(self, result_queue, shared_poll_state, **kwargs):
+        self.result_queue = result_queue
+        self.shared_poll_state = shared_poll_state
+        # 推理进程不按键
+        super().__init__(input_backend=RecordingBackend(), **kwargs)
+
+    def poll_state(self):
+        # 本进程负责的牌桌中最快的档位发布给截图进程，由截图进程控制频率
+        state = super().poll_state()
+        self.shared_poll_state.value = PollScheduler.STATES.index(state)
+        return state
+
+    def take_action(self, poker1, poker2, table=None):
+        table = table or self.tables[0]
+        # perf_counter_ns 在同一台机器的各进程间可比，主进程按键后据此统计开牌到按键的耗时
+        self.result_queue.put(('action', table.name, poker1.classic, poker2.classic, table.reveal_ns))
+
+
+def inference_worker(index, tables, all_regions, ring_name, shape, slots, frame_queue, result_queue, model_options,
+                     runtime_profile, stats_stride, confidence_threshold, stale_counter, poll_state, stop,
+                     latency_path='', latency_dump_interval=0.0, log_rate_limits=None):
+    if runtime_profile is not None:
+        runtime_profile.apply()
+    ring = SharedFrameRing(shape, slots, name=ring_name)
+    # 与截图进程使用同一个外接矩形，按本进程负责的区域切片
+    capture = ScreenCapture(all_regions)
+    slices = [capture.slices[all_regions.index(region)] for table in tables for region in table.card_regions]
+
+    def update_image(image1, image2, poker1, poker2):
+        result_queue.put(('image', image1, image2, poker1.classic if poker1 else None,
+                          poker2.classic if poker2 else None))
+
+    game = WorkerGameController(
+        result_queue, poll_state, tables=tables, log_pipeline=QueueLog(result_queue, log_rate_limits),
+        update_image_callback=update_image, frame_source=RingFrameSource(ring, slices, frame_queue, stale_counter, stop),
+        stats_stride=stats_stride, model_options=model_options, runtime_profile=runtime_profile,
+        tracer=LatencyTracer(worker_latency_path(latency_path, index), latency_dump_interval),
+        # 截图进程已控制频率，推理进程来一帧处理一帧
+        scheduler=PollScheduler(idle_fps=0, backs_fps=0, reveal_fps=0))
+    try:
+        game.run(confidence_threshold)
+    finally:
+        game.dump_latency()
+        ring.close()
+        result_queue.put(('done', index))
+
+
+def worker_latency_path(path, index):
+    """推理进程各写一个文件：latency.json -> latency_worker0.json"""
+    root, ext = os.path.splitext(path or 'latency.json')
+    return f"{root}_worker{index}{ext}"
+
+
+class PipelineController(BetActions):
+    """流水线模式的主进程：启动截图和推理进程，执行回传的下注决策，定期报告各级队列深度和丢帧"""
+
+    def __init__(self, tables, log_callback=None, update_image_callback=None, model_options=None, runtime_profile=None,
+                 stats_stride=1, workers=1, queue_size=2, drop_policy='drop_oldest', scheduler=None, ring_slots=8,
+                 report_interval=30.0, tracer=None, log_pipeline=None, input_backend=None):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"不支持的丢帧策略: {drop_policy}，可选: {', '.join(DROP_POLICIES)}")
+        self.tables = tables
+        self.log_callback = log_callback
+        self.log_pipeline = log_pipeline
+        self.update_image_callback = update_image_callback
+        self.model_options = model_options or {}
+        self.runtime_profile = runtime_profile
+        self.stats_stride = stats_stride
+        # 每张牌桌只能由一个推理进程负责
+        self.workers = max(1, min(workers, len(tables)))
+        self.queue_size = queue_size
+        self.drop_policy = drop_policy
+        # 截图频率档位与单进程模式相同，由截图进程按推理进程发布的牌局状态切换
+        self.scheduler = scheduler or PollScheduler()
+        self.ring_slots = ring_slots
+        self.report_interval = report_interval
+        # 主进程只记录广播和按键；各推理进程的截图、统计、推理耗时写到各自的文件
+        self.tracer = tracer or LatencyTracer()
+        self.prepare_input(input_backend or create_input_backend())
+        self.open_socket()
+        self.context = multiprocessing.get_context('spawn')
+        self.stop_event = self.context.Event()
+        self.paused = self.context.Event()
+        self.is_running = True
+
+    def pause(self):
+        self.paused.set()
+        self.log("暂停游戏...")
+
+    def resume(self):
+        self.paused.clear()
+        self.log("继续游戏...")
+
+    def stop(self):
+        self.is_running = False
+        self.stop_event.set()
+        self.log("停止游戏...")
+
+    def run(self, confidence_threshold=0.9999):
+        regions = [region for table in self.tables for region in table.card_regions]
+        bounds = ScreenCapture(regions).bounds
+        shape = (bounds['height'], bounds['width'], 4)
+        ring = SharedFrameRing(shape, self.ring_slots)
+        frame_queues = [self.context.Queue(self.queue_size) for _ in range(self.workers)]
+        result_queue = self.context.Queue()
+        counters = {
+            'captured': self.context.Value('q', 0),
+            'dropped': [self.context.Value('q', 0) for _ in range(self.workers)],
+            'stale': [self.context.Value('q', 0) for _ in range(self.workers)],
+        }
+        # 各推理进程当前最快的牌局档位（PollScheduler.STATES 下标），单个整数读写无需加锁
+        poll_states = [self.context.Value('i', 0, lock=False) for _ in range(self.workers)]
+        processes = [self.context.Process(
+            target=capture_worker, daemon=True,
+            args=(regions, ring.name, shape, self.ring_slots, frame_queues, self.drop_policy, self.scheduler,
+                  poll_states, counters, self.paused, self.stop_event, self.runtime_profile))]
+        for index in range(self.workers):
+            processes.append(self.context.Process(
+                target=inference_worker, daemon=True,
+                args=(index, self.tables[index::self.workers], regions, ring.name, shape, self.ring_slots,
+                      frame_queues[index], result_queue, self.model_options, self.runtime_profile, self.stats_stride,
+                      confidence_threshold, counters['stale'][index], poll_states[index], self.stop_event,
+                      self.tracer.path, self.tracer.dump_interval,
+                      # 与主进程日志管道相同的限流配置，在推理进程入队前生效
+                      self.log_pipeline.rate_limits if self.log_pipeline is not None else None)))
+        for process in processes:
+            process.start()
+        self.log(f"流水线模式: 1 个截图进程, {self.workers} 个推理进程, 队列长度 {self.queue_size}, {self.drop_policy}, "
+                 f"按键方式 {self.input_backend.name}")
+
+        tables = {table.name: table for table in self.tables}
+        workers = dict(enumerate(processes[1:]))
+        done = set()
+        last_report = time.monotonic()
+        try:
+            while len(done) < self.workers:
+                try:
+                    message = result_queue.get(timeout=0.5)
+                except queue.Empty:
+                    message = None
+                if message is not None:
+                    kind = message[0]
+                    if kind == 'action':
+                        _, name, classic1, classic2, reveal_ns = message
+                        tables[name].reveal_ns = reveal_ns
+                        self.take_action(Poker(classic1), Poker(classic2), tables[name])
+                    elif kind == 'log':
+                        _, log_kind, template, args = message
+                        self.log(template, *args, kind=log_kind)
+                    elif kind == 'image':
+                        _, image1, image2, classic1, classic2 = message
+                        self.update_image_callback(image1, image2, None if classic1 is None else Poker(classic1),
+                                                   None if classic2 is None else Poker(classic2))
+                    elif kind == 'done':
+                        done.add(message[1])
+                else:
+                    # 队列空闲时检查进程：已停止则不再等待 done，异常退出的进程不会发送 done
+                    if self.stop_event.is_set():
+                        break
+                    if not processes[0].is_alive():
+                        self.log(f"截图进程异常退出，退出码 {processes[0].exitcode}，停止流水线")
+                        self.stop_event.set()
+                    for index, process in workers.items():
+                        if index not in done and not process.is_alive():
+                            done.add(index)
+                            self.log(f"推理进程 {index} 异常退出，退出码 {process.exitcode}，停止流水线")
+                            self.stop_event.set()
+                self.tracer.maybe_dump()
+                if time.monotonic() - last_report >= self.report_interval:
+                    last_report = time.monotonic()
+                    self.log_report(frame_queues, result_queue, counters)
+        finally:
+            self.stop_event.set()
+            for process in processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+            ring.close()
+
+    def dump_latency(self):
+        """主进程的耗时直方图写入 JSON 文件；推理进程的文件在退出时和定期写入"""
+        return self.tracer.dump()
+
+    @staticmethod
+    def queue_depth(frame_queue):
+        try:
+            return frame_queue.qsize()
+        except NotImplementedError:
+            # macOS 不支持 qsize
+            return -1
+
+    def log_report(self, frame_queues, result_queue, counters):
+        self.log(f"截图进程: 已截取 {counters['captured'].value} 帧  结果队列深度 {self.queue_depth(result_queue)}")
+        for index, frame_queue in enumerate(frame_queues):
+            self.log(f"推理进程 {index}: 队列深度 {self.queue_depth(frame_queue)}/{self.queue_size}  "
+                     f"丢帧 {counters['dropped'][index].value}  被覆盖 {counters['stale'][index].value}")
+        self.log(f"耗时分位数(毫秒): {self.tracer.format()}")
+        if self.log_pipeline is not None:
+            self.log(f"日志: {self.log_pipeline.format()}")
@@ -0,0 +1,94 @@
+# pixel_stats.py
+# 白色/红色像素占比的单遍统计
+import functools
+import time
+
+import cv2
+import numpy as np
+
+WHITE_BIT = 1
+RED_BIT = 2
+
+
+@functools.lru_cache(maxsize=4)
+def build_pixel_lut(white_threshold=200, lower_red1=(0, 100, 100), upper_red1=(10, 255, 255),
+                    lower_red2=(160, 100, 100), upper_red2=(180, 255, 255)):
+    """为 2^24 种颜色预先计算白色/红色标记，下标为 (R << 16) | (G << 8) | B
+
+    白色沿用原来对 BGRA 四个通道求均值的判定，截图的 alpha 恒为 255，
+    即 B + G + R + 255 > 4 * white_threshold；红色直接用 OpenCV 的 HSV 结果生成，与原实现逐像素一致
+    """
+    lut = np.empty((256, 256, 256), dtype=np.uint8)
+    green, blue = np.meshgrid(np.arange(256, dtype=np.uint16), np.arange(256, dtype=np.uint16), indexing='ij')
+    plane = np.empty((256, 256, 3), dtype=np.uint8)
+    plane[..., 0] = blue
+    plane[..., 1] = green
+    white_sum = 4 * white_threshold - 255
+    for red in range(256):
+        plane[..., 2] = red
+        hsv = cv2.cvtColor(plane, cv2.COLOR_BGR2HSV)
+        red_mask = cv2.inRange(hsv, lower_red1, upper_red1) | cv2.inRange(hsv, lower_red2, upper_red2)
+        white_mask = (blue + green + red) > white_sum
+        lut[red] = np.where(white_mask, WHITE_BIT, 0) | np.where(red_mask > 0, RED_BIT, 0)
+    return lut.reshape(-1)
+
+
+def get_white_red_ratio(image, white_threshold=200, stride=1):
+    """一次查表同时得到白色像素占比和红色像素占比，stride > 1 时隔行隔列抽样"""
+    if stride > 1:
+        image = image[::stride, ::stride]
+    lut = build_pixel_lut(white_threshold)
+    if image.shape[2] == 4:
+        # 小端下 BGRA 四字节即 (A << 24) | (R << 16) | (G << 8) | B
+        codes = image.view(np.uint32)[..., 0] & 0xFFFFFF
+    else:
+        codes = (image[..., 2].astype(np.uint32) << 16) | (image[..., 1].astype(np.uint32) << 8) | image[..., 0]
+    counts = np.bincount(lut[codes].ravel(), minlength=4)
+    total = codes.size
+    white_ratio = (counts[WHITE_BIT] + counts[WHITE_BIT | RED_BIT]) / total
+    red_ratio = (counts[RED_BIT] + counts[WHITE_BIT | RED_BIT]) / total
+    return float(white_ratio), float(red_ratio)
+
+
+def legacy_white_ratio(image, threshold=200):
+    """原 ImageProcessor.get_white_ratio，用于对比"""
+    gray = np.mean(image, axis=2)
+    return np.count_nonzero(gray > threshold) / gray.size
+
+
+def legacy_red_ratio(image, lower_red1=(0, 100, 100), upper_red1=(10, 255, 255),
+                     lower_red2=(160, 100, 100), upper_red2=(180, 255, 255)):
+    """原 ImageProcessor._get_red_ratio，用于对比"""
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    mask1 = cv2.inRange(hsv, lower_red1, upper_red1)
+    mask2 = cv2.inRange(hsv, lower_red2, upper_red2)
+    red_mask = cv2.bitwise_or(mask1, mask2)
+    return np.count_nonzero(red_mask) / red_mask.size
+
+
+def benchmark(size=59, rounds=2000):
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (size * 3, size * 3, 4), dtype=np.uint8)
+    frame[..., 3] = 255
+    image = frame[size:size * 2, size:size * 2]  # 与实际截图一样是整帧中的视图
+
+    start = time.perf_counter()
+    build_pixel_lut()
+    print(f"查找表构建耗时: {(time.perf_counter() - start) * 1000:.1f} 毫秒")
+
+    fused = get_white_red_ratio(image)
+    legacy = (legacy_white_ratio(image), legacy_red_ratio(image))
+    print(f"结果 合并: {fused}  原实现: {legacy}  一致: {np.allclose(fused, legacy)}")
+
+    for name, func in [('原实现', lambda: (legacy_white_ratio(image), legacy_red_ratio(image))),
+                       ('合并', lambda: get_white_red_ratio(image)),
+                       ('合并 stride=2', lambda: get_white_red_ratio(image, stride=2))]:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            func()
+        elapsed = (time.perf_counter() - start) / rounds
+        print(f"{name}: {elapsed * 1e6:.1f} 微秒/次")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -49,3 +49,43 @@ class PokerCNN3Class(nn.Module):
         x = self.fc2(x)
         
         return x
+
+
+class PokerCNN3ClassTiny(nn.Module):
+    """低分辨率的小模型，只区分 无牌 / 牌背 / 牌面，拿不准时再交给 PokerCNN3Class"""
+    def __init__(self, num_classes=3, input_size=24):
+        super(PokerCNN3ClassTiny, self).__init__()
+        self.input_size = input_size
+        # 三次池化后的边长，input_size 需为 8 的倍数
+        self.feature_size = input_size // 8
+
+        # 卷积层
+        self.conv1 = nn.Conv2d(3, 16, kernel_size=3, padding=1)
+        self.conv2 = nn.Conv2d(16, 32, kernel_size=3, padding=1)
+        self.conv3 = nn.Conv2d(32, 64, kernel_size=3, padding=1)
+
+        # 批归一化层
+        self.bn1 = nn.BatchNorm2d(16)
+        self.bn2 = nn.BatchNorm2d(32)
+        self.bn3 = nn.BatchNorm2d(64)
+
+        # 池化层
+        self.pool = nn.MaxPool2d(2, 2)
+
+        # 全连接层
+        self.fc1 = nn.Linear(64 * self.feature_size * self.feature_size, 64)
+        self.fc2 = nn.Linear(64, num_classes)
+
+    @staticmethod
+    def input_size_from_state_dict(state_dict):
+        # 由 fc1 的输入维度反推训练时的输入边长
+        features = state_dict['fc1.weight'].shape[1] // 64
+        return int(round(features ** 0.5)) * 8
+
+    def forward(self, x):
+        x = self.pool(F.relu(self.bn1(self.conv1(x))))
+        x = self.pool(F.relu(self.bn2(self.conv2(x))))
+        x = self.pool(F.relu(self.bn3(self.conv3(x))))
+        x = x.view(-1, 64 * self.feature_size * self.feature_size)
+        x = F.relu(self.fc1(x))
+        return self.fc2(x)
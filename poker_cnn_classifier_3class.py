@@ -1,25 +1,61 @@
 import time
+import numpy as np
 import torch
 from torchvision import transforms
 from PIL import Image
 from pathlib import Path
-from poker_cnn_3class import PokerCNN3Class
+from preprocess import ArrayPreprocessor
+from model_optimizer import load_fused
+from inference_backend import CPU_RUNTIMES, load_backend
+from result_cache import ResultCache
+from poker_cnn_3class import PokerCNN3Class, PokerCNN3ClassTiny
 
 class PokerImageClassifier3Class:
-    def __init__(self, model_path='best_poker_cnn_3class.pth', num_classes=3, device='cuda'):
-        self.device = torch.device(device if torch.cuda.is_available() else 'cpu')
-        print(f'Using device: {self.device}')
-        self.model = self.load_model(model_path, num_classes, self.device)
+    def __init__(self, model_path='best_poker_cnn_3class.pth', num_classes=3, device='cuda', runtime='eager', cache_size=0,
+                 cascade_model_path=None, cascade_threshold=0.98):
+        # ONNX Runtime 和量化模型只用 CPU
+        self.device = torch.device(device if torch.cuda.is_available() and runtime not in CPU_RUNTIMES else 'cpu')
+        print(f'Using device: {self.device}, runtime: {runtime}')
+        if runtime == 'eager' and model_path.endswith('.pth'):
+            self.model = self.load_model(model_path, num_classes, self.device)
+        else:
+            # export_models.py / quantize_models.py 导出的 TorchScript / ONNX / INT8 模型
+            self.model = load_backend(model_path, runtime, self.device)
+        # 优化版模型已把 Normalize 折叠进第一层卷积
+        normalize = getattr(self.model, 'normalized_input', True)
         self.transform = transforms.Compose([
             transforms.Resize((64, 64)),
             transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                                 std=[0.229, 0.224, 0.225])
-        ])
+        ] + ([transforms.Normalize(mean=[0.485, 0.456, 0.406],
+                                   std=[0.229, 0.224, 0.225])] if normalize else []))
+        # 截图数组直接转张量，不经过 PIL
+        self.preprocessor = ArrayPreprocessor(size=64, normalize=normalize)
+        # 按截图内容缓存识别结果，0 为不缓存
+        self.cache = ResultCache(cache_size) if cache_size > 0 else None
+        # 级联：低分辨率小模型先判断，置信度低于阈值的再交给完整模型
+        self.tiny_model = self.load_tiny_model(cascade_model_path, self.device) if cascade_model_path else None
+        if self.tiny_model is not None:
+            self.tiny_preprocessor = ArrayPreprocessor(size=self.tiny_model.input_size)
+        self.cascade_threshold = cascade_threshold
+        self.tiny_accepted = 0
+        self.fallbacks = 0
 
     def load_model(self, model_path, num_classes, device):
-        model = PokerCNN3Class(num_classes=num_classes)
-        model.load_state_dict(torch.load(model_path, map_location=device))
+        checkpoint = torch.load(model_path, map_location=device)
+        if checkpoint.get('format') == 'fused':
+            # model_optimizer.py 导出的推理优化版
+            model = load_fused(checkpoint)
+        else:
+            model = PokerCNN3Class(num_classes=num_classes)
+            model.load_state_dict(checkpoint)
+        model.to(device)
+        model.eval()
+        return model
+
+    def load_tiny_model(self, model_path, device):
+        state_dict = torch.load(model_path, map_location=device)
+        model = PokerCNN3ClassTiny(input_size=PokerCNN3ClassTiny.input_size_from_state_dict(state_dict))
+        model.load_state_dict(state_dict)
         model.to(device)
         model.eval()
         return model
@@ -50,18 +86,71 @@ class PokerImageClassifier3Class:
             return predicted.item(), confidence
 
     def detect_image(self, image):
-        image = self.transform(image)
-        image = image.unsqueeze(0)
-        image = image.to(self.device)
+        predicted, confidences = self.detect_batch([image])
+        return predicted[0], confidences[0]
+
+    def detect_batch(self, images):
+        """多张截图拼成一个批次，一次前向返回每张图的类别和置信度"""
+        if self.cache is None or not isinstance(images[0], np.ndarray):
+            return self._detect_batch(images)
+        # 命中缓存的直接返回，其余的拼成一个批次推理
+        keys = [self.cache.key(image) for image in images]
+        results = [self.cache.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            predicted, confidences = self._detect_batch([images[i] for i in missing])
+            for i, predicted_class, confidence in zip(missing, predicted, confidences):
+                results[i] = (predicted_class, confidence)
+                self.cache.put(keys[i], results[i])
+        return [result[0] for result in results], [result[1] for result in results]
+
+    def warm_up(self, rounds=3, batch_size=2):
+        # 首次前向要分配内存、选择算子实现，预先跑几次（不经过缓存）
+        images = [np.zeros((64, 64, 4), dtype=np.uint8)] * batch_size
+        for _ in range(rounds):
+            self._detect_full(images)
+            if self.tiny_model is not None:
+                self._detect_batch(images)
+        self.tiny_accepted = self.fallbacks = 0
+
+    def _detect_batch(self, images):
+        if self.tiny_model is None or not isinstance(images[0], np.ndarray):
+            return self._detect_full(images)
+        batch = self.tiny_preprocessor(images).to(self.device)
         with torch.no_grad():
-            output = self.model(image)
+            confidences, predicted = torch.max(torch.nn.functional.softmax(self.tiny_model(batch), dim=1), 1)
+        predicted, confidences = predicted.tolist(), confidences.tolist()
+        uncertain = [i for i, confidence in enumerate(confidences) if confidence < self.cascade_threshold]
+        self.tiny_accepted += len(images) - len(uncertain)
+        self.fallbacks += len(uncertain)
+        if uncertain:
+            full_predicted, full_confidences = self._detect_full([images[i] for i in uncertain])
+            for i, predicted_class, confidence in zip(uncertain, full_predicted, full_confidences):
+                predicted[i] = predicted_class
+                confidences[i] = confidence
+        return predicted, confidences
+
+    def cascade_stats(self):
+        total = self.tiny_accepted + self.fallbacks
+        return {
+            'tiny_accepted': self.tiny_accepted,
+            'fallbacks': self.fallbacks,
+            'fallback_rate': self.fallbacks / total if total else 0.0,
+        }
+
+    def _detect_full(self, images):
+        if isinstance(images[0], np.ndarray):
+            batch = self.preprocessor(images)
+        else:
+            batch = torch.stack([self.transform(image) for image in images])
+        batch = batch.to(self.device)
+        with torch.no_grad():
+            output = self.model(batch)
 
             # 获取预测类别和置信度
             probabilities = torch.nn.functional.softmax(output, dim=1)
-            _, predicted = torch.max(probabilities, 1)
-            confidence = probabilities[0][predicted].item()
-
-            return predicted.item(), confidence
+            confidences, predicted = torch.max(probabilities, 1)
+            return predicted.tolist(), confidences.tolist()
 
     def infer_images(self, image_dir):
         image_dir = Path(image_dir)
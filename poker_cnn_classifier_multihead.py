@@ -0,0 +1,59 @@
+import numpy as np
+import torch
+from torchvision import transforms
+from preprocess import ArrayPreprocessor
+from poker_cnn_multihead import PokerCNNMultiHead
+
+
+class PokerImageClassifierMultiHead:
+    def __init__(self, model_path='best_poker_cnn_multihead.pth', num_classes=52, num_background_classes=3, device='cuda'):
+        self.device = torch.device(device if torch.cuda.is_available() else 'cpu')
+        print(f'Using device: {self.device}')
+        self.model = self.load_model(model_path, num_classes, num_background_classes, self.device)
+        self.transform = transforms.Compose([
+            transforms.Resize((64, 64)),
+            transforms.ToTensor(),
+            transforms.Normalize(mean=[0.485, 0.456, 0.406],
+                                 std=[0.229, 0.224, 0.225])
+        ])
+        # 截图数组直接转张量，不经过 PIL
+        self.preprocessor = ArrayPreprocessor(size=64)
+
+    def load_model(self, model_path, num_classes, num_background_classes, device):
+        model = PokerCNNMultiHead(num_classes=num_classes, num_background_classes=num_background_classes)
+        model.load_state_dict(torch.load(model_path, map_location=device))
+        model.to(device)
+        model.eval()
+        return model
+
+    def warm_up(self, rounds=3, batch_size=2):
+        # 首次前向要分配内存、选择算子实现，预先跑几次
+        images = [np.zeros((64, 64, 4), dtype=np.uint8)] * batch_size
+        for _ in range(rounds):
+            self.detect_batch(images)
+
+    def detect_batch(self, images):
+        """一次前向同时返回牌面类别、牌面置信度、背景类别、背景置信度（均为列表）"""
+        if isinstance(images[0], np.ndarray):
+            batch = self.preprocessor(images)
+        else:
+            batch = torch.stack([self.transform(image) for image in images])
+        batch = batch.to(self.device)
+        with torch.no_grad():
+            card_output, background_output = self.model(batch)
+            card_confidences, card_predicted = torch.max(torch.nn.functional.softmax(card_output, dim=1), 1)
+            background_confidences, background_predicted = torch.max(
+                torch.nn.functional.softmax(background_output, dim=1), 1)
+            return (card_predicted.tolist(), card_confidences.tolist(),
+                    background_predicted.tolist(), background_confidences.tolist())
+
+
+if __name__ == "__main__":
+    from PIL import Image
+
+    classifier = PokerImageClassifierMultiHead()
+    single_image_path = 'datasets/region1/images/108_0000000001.jpg'
+    image = Image.open(single_image_path).convert('RGB')
+    card, card_confidence, background, background_confidence = classifier.detect_batch([image])
+    print(f"Single Image: {single_image_path}, Card: {card[0]} [{card_confidence[0]:.4f}], "
+          f"Background: {background[0]} [{background_confidence[0]:.4f}]")
@@ -0,0 +1,55 @@
+import torch.nn as nn
+import torch.nn.functional as F
+
+
+class PokerCNNMultiHead(nn.Module):
+    """共享卷积主干，同时输出 52 类牌面和 3 类背景两个结果"""
+
+    def __init__(self, num_classes=52, num_background_classes=3, background_hidden=64):
+        super(PokerCNNMultiHead, self).__init__()
+
+        # 卷积层（与 PokerCNN 同名，可直接加载其权重）
+        self.conv1 = nn.Conv2d(3, 32, kernel_size=3, padding=1)
+        self.conv2 = nn.Conv2d(32, 64, kernel_size=3, padding=1)
+        self.conv3 = nn.Conv2d(64, 128, kernel_size=3, padding=1)
+        self.conv4 = nn.Conv2d(128, 256, kernel_size=3, padding=1)
+
+        # 批归一化层
+        self.bn1 = nn.BatchNorm2d(32)
+        self.bn2 = nn.BatchNorm2d(64)
+        self.bn3 = nn.BatchNorm2d(128)
+        self.bn4 = nn.BatchNorm2d(256)
+
+        # 池化层
+        self.pool = nn.MaxPool2d(2, 2)
+
+        # Dropout层
+        self.dropout = nn.Dropout(0.5)
+
+        # 牌面头
+        self.fc1 = nn.Linear(256 * 4 * 4, 512)
+        self.fc2 = nn.Linear(512, num_classes)
+
+        # 背景头，判断背景所需信息少，隐藏层更小
+        self.bg_fc1 = nn.Linear(256 * 4 * 4, background_hidden)
+        self.bg_fc2 = nn.Linear(background_hidden, num_background_classes)
+
+    def forward(self, x):
+        # 共享主干
+        x = self.pool(F.relu(self.bn1(self.conv1(x))))
+        x = self.pool(F.relu(self.bn2(self.conv2(x))))
+        x = self.pool(F.relu(self.bn3(self.conv3(x))))
+        x = self.pool(F.relu(self.bn4(self.conv4(x))))
+        x = x.view(-1, 256 * 4 * 4)
+
+        # 牌面头
+        card = F.relu(self.fc1(x))
+        card = self.dropout(card)
+        card = self.fc2(card)
+
+        # 背景头
+        background = F.relu(self.bg_fc1(x))
+        background = self.dropout(background)
+        background = self.bg_fc2(background)
+
+        return card, background
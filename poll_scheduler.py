@@ -0,0 +1,67 @@
+# poll_scheduler.py
+import time
+
+
+class PollScheduler:
+    """按牌局状态决定截图频率：无牌时慢、看到牌背后快、开牌时不限速"""
+
+    IDLE = 'idle'
+    BACKS = 'backs'
+    REVEAL = 'reveal'
+    # 按频率从慢到快排列
+    STATES = (IDLE, BACKS, REVEAL)
+
+    def __init__(self, idle_fps=10.0, backs_fps=30.0, reveal_fps=0.0, frame_budget_ms=30.0, report_interval=30.0):
+        # fps <= 0 表示不限速
+        self.intervals = {
+            self.IDLE: 1.0 / idle_fps if idle_fps > 0 else 0.0,
+            self.BACKS: 1.0 / backs_fps if backs_fps > 0 else 0.0,
+            self.REVEAL: 1.0 / reveal_fps if reveal_fps > 0 else 0.0,
+        }
+        self.frame_budget = frame_budget_ms / 1000.0
+        self.report_interval = report_interval
+        self.fps = 0.0
+        self.frames = 0
+        self.over_budget = 0
+        self._frame_start = None
+        self._window_start = time.perf_counter()
+        self._window_frames = 0
+
+    @classmethod
+    def fastest(cls, states):
+        """多个牌桌中最快的档位，没有牌桌时为 IDLE"""
+        return max(states, key=cls.STATES.index, default=cls.IDLE)
+
+    def wait(self, state):
+        """在每帧开始前调用：统计上一帧耗时，并睡到该状态下一帧的开始时间"""
+        now = time.perf_counter()
+        if self._frame_start is not None:
+            frame_time = now - self._frame_start
+            if frame_time > self.frame_budget:
+                self.over_budget += 1
+            remaining = self.intervals[state] - frame_time
+            if remaining > 0:
+                time.sleep(remaining)
+                now = time.perf_counter()
+        self._frame_start = now
+        self.frames += 1
+        self._window_frames += 1
+
+    def reset(self):
+        """暂停后重新计时，避免把暂停时间算作帧耗时"""
+        self._frame_start = None
+        self._window_start = time.perf_counter()
+        self._window_frames = 0
+
+    def report(self):
+        """每隔 report_interval 秒返回一次 (实际帧率, 超出预算的帧数)，其余时间返回 None"""
+        now = time.perf_counter()
+        elapsed = now - self._window_start
+        if elapsed < self.report_interval:
+            return None
+        self.fps = self._window_frames / elapsed
+        over_budget = self.over_budget
+        self._window_start = now
+        self._window_frames = 0
+        self.over_budget = 0
+        return self.fps, over_budget
@@ -0,0 +1,49 @@
+# preprocess.py
+import threading
+
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+def to_pil_image(frame):
+    """BGRA/BGR 截图转为 RGB 的 PIL 图片，只在界面显示或存档时才需要"""
+    code = cv2.COLOR_BGRA2RGB if frame.shape[2] == 4 else cv2.COLOR_BGR2RGB
+    return Image.fromarray(cv2.cvtColor(frame, code))
+
+
+class ArrayPreprocessor:
+    """BGRA 截图直接转为归一化后的模型输入，等价于 Resize + ToTensor + Normalize，不经过 PIL"""
+
+    def __init__(self, size=64, mean=IMAGENET_MEAN, std=IMAGENET_STD, normalize=True):
+        self.size = size
+        mean = np.asarray(mean if normalize else (0.0, 0.0, 0.0), dtype=np.float32)
+        std = np.asarray(std if normalize else (1.0, 1.0, 1.0), dtype=np.float32)
+        # (x / 255 - mean) / std 合并为一次乘减
+        self.scale = (1.0 / (255.0 * std)).reshape(3, 1, 1)
+        self.offset = (mean / std).reshape(3, 1, 1)
+        # 每个线程一块预分配的缓冲区
+        self._local = threading.local()
+
+    def _buffer(self, count):
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None or len(buffer) < count:
+            buffer = np.empty((count, 3, self.size, self.size), dtype=np.float32)
+            self._local.buffer = buffer
+        return buffer[:count]
+
+    def __call__(self, frames):
+        """frames 为 BGRA/BGR 数组列表，返回 (N, 3, size, size) 张量；张量复用缓冲区，下次调用前需用完"""
+        buffer = self._buffer(len(frames))
+        for out, frame in zip(buffer, frames):
+            # 放大用双线性与 PIL 结果相差不超过 1，缩小用区域插值
+            interpolation = cv2.INTER_LINEAR if frame.shape[0] <= self.size else cv2.INTER_AREA
+            resized = cv2.resize(frame, (self.size, self.size), interpolation=interpolation)
+            # BGR(A) -> RGB、HWC -> CHW 与归一化在一次运算中完成
+            np.multiply(resized[:, :, 2::-1].transpose(2, 0, 1), self.scale, out=out)
+            np.subtract(out, self.offset, out=out)
+        return torch.from_numpy(buffer)
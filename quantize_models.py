@@ -0,0 +1,145 @@
+# quantize_models.py
+# INT8 量化：卷积部分静态量化（用 datasets 校准），全连接层动态量化；验证集准确率不达标时不输出模型
+import argparse
+import copy
+import itertools
+
+import torch
+import torch.nn as nn
+from torch.ao import quantization
+from torch.utils.data import DataLoader
+from torchvision import transforms
+
+import train_cnn
+import train_cnn_3class
+from inference_backend import runtime_model_path
+from poker_cnn import PokerCNN
+from poker_cnn_3class import PokerCNN3Class
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+class QuantizablePokerCNN(nn.Module):
+    """PokerCNN / PokerCNN3Class 的可量化版本，输入为未归一化的 [0, 1] RGB，归一化在量化前完成"""
+
+    def __init__(self, model, mean=IMAGENET_MEAN, std=IMAGENET_STD):
+        super(QuantizablePokerCNN, self).__init__()
+        self.register_buffer('mean', torch.tensor(mean).view(1, 3, 1, 1))
+        self.register_buffer('std', torch.tensor(std).view(1, 3, 1, 1))
+        self.quant = quantization.QuantStub()
+        layers = []
+        for index in range(1, 5):
+            layers += [getattr(model, f'conv{index}'), getattr(model, f'bn{index}'), nn.ReLU(), nn.MaxPool2d(2, 2)]
+        self.features = nn.Sequential(*layers)
+        self.dequant = quantization.DeQuantStub()
+        self.fc1 = model.fc1
+        self.relu = nn.ReLU()
+        self.fc2 = model.fc2
+
+    def forward(self, x):
+        x = (x - self.mean) / self.std
+        x = self.quant(x)
+        x = self.features(x)
+        x = self.dequant(x)
+        x = x.flatten(1)
+        x = self.relu(self.fc1(x))
+        return self.fc2(x)
+
+    def fuse(self):
+        # conv + bn + relu 融合为一个量化算子
+        quantization.fuse_modules(self.features, [[str(i), str(i + 1), str(i + 2)] for i in range(0, 16, 4)],
+                                  inplace=True)
+
+
+def select_engine():
+    engines = torch.backends.quantized.supported_engines
+    for engine in ('x86', 'fbgemm', 'qnnpack'):
+        if engine in engines:
+            torch.backends.quantized.engine = engine
+            return engine
+    raise RuntimeError("当前 PyTorch 不支持量化推理")
+
+
+@torch.no_grad()
+def evaluate(model, loader):
+    corrects = total = 0
+    for inputs, labels in loader:
+        outputs = model(inputs)
+        corrects += (outputs.argmax(1) == labels).sum().item()
+        total += labels.size(0)
+    return corrects / total if total else 0.0
+
+
+@torch.no_grad()
+def quantize(model, calibration_loader, calibration_batches, engine):
+    wrapper = QuantizablePokerCNN(copy.deepcopy(model).eval()).eval()
+    wrapper.fuse()
+    wrapper.qconfig = quantization.get_default_qconfig(engine)
+    # 全连接层不做静态量化，后面改为动态量化
+    wrapper.fc1.qconfig = None
+    wrapper.fc2.qconfig = None
+    quantization.prepare(wrapper, inplace=True)
+    for inputs, _ in itertools.islice(calibration_loader, calibration_batches):
+        wrapper(inputs)
+    quantization.convert(wrapper, inplace=True)
+    return quantization.quantize_dynamic(wrapper, {nn.Linear}, dtype=torch.qint8)
+
+
+def build_loaders(kind, transform, batch_size=64):
+    if kind == 'card':
+        train_dataset = train_cnn.PokerDataset(img_dir='datasets/train_3class/images',
+                                               label_dir='datasets/train_3class/labels', transform=transform)
+        val_dataset = train_cnn.PokerDataset(img_dir='datasets/val/images', label_dir='datasets/val/labels',
+                                             transform=transform)
+    else:
+        train_dataset = train_cnn_3class.PokerDataset(img_dir='datasets/train_3class', transform=transform)
+        val_dataset = train_cnn_3class.PokerDataset(img_dir='datasets/val_3class', transform=transform)
+    return (DataLoader(train_dataset, batch_size=batch_size, shuffle=True, num_workers=4),
+            DataLoader(val_dataset, batch_size=batch_size, shuffle=False, num_workers=4))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='INT8 量化分类模型，验证集准确率不达标时不输出模型')
+    parser.add_argument('--model', choices=['card', 'background'], default='card')
+    parser.add_argument('--model-path', help='默认 best_poker_cnn.pth / best_poker_cnn_3class.pth')
+    parser.add_argument('--calibration-batches', type=int, default=32)
+    parser.add_argument('--min-accuracy', type=float, default=0.99, help='量化模型验证集准确率下限')
+    parser.add_argument('--max-drop', type=float, default=0.005, help='相对原模型允许下降的准确率')
+    args = parser.parse_args()
+
+    if args.model == 'card':
+        model_class, num_classes, default_path = PokerCNN, 52, 'best_poker_cnn.pth'
+    else:
+        model_class, num_classes, default_path = PokerCNN3Class, 3, 'best_poker_cnn_3class.pth'
+    model_path = args.model_path or default_path
+
+    model = model_class(num_classes=num_classes)
+    model.load_state_dict(torch.load(model_path, map_location='cpu'))
+    model.eval()
+
+    engine = select_engine()
+    print(f'Quantized engine: {engine}')
+
+    # 量化模型自带归一化，数据只做 Resize + ToTensor
+    transform = transforms.Compose([transforms.Resize((64, 64)), transforms.ToTensor()])
+    calibration_loader, val_loader = build_loaders(args.model, transform)
+
+    float_model = QuantizablePokerCNN(model).eval()
+    float_acc = evaluate(float_model, val_loader)
+    quantized = quantize(model, calibration_loader, args.calibration_batches, engine)
+    quantized_acc = evaluate(quantized, val_loader)
+    print(f"FP32 Acc: {float_acc:.4f}  INT8 Acc: {quantized_acc:.4f}")
+
+    if quantized_acc < args.min_accuracy or float_acc - quantized_acc > args.max_drop:
+        raise SystemExit(f"量化后准确率不达标（下限 {args.min_accuracy}，允许下降 {args.max_drop}），不输出模型")
+
+    output_path = runtime_model_path(model_path, 'int8')
+    with torch.no_grad():
+        traced = torch.jit.trace(quantized, torch.rand(1, 3, 64, 64))
+    traced.save(output_path)
+    print(f"{model_path} -> {output_path}")
+
+
+if __name__ == '__main__':
+    main()
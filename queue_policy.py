@@ -0,0 +1,25 @@
+# queue_policy.py
+# 有界队列满时的丢弃策略，流水线的帧队列和截图存档队列共用
+import queue
+
+DROP_POLICIES = ('drop_oldest', 'drop_newest')
+
+
+def put_with_policy(bounded_queue, item, drop_policy):
+    """队列满时按策略丢弃，返回丢弃的条数"""
+    try:
+        bounded_queue.put_nowait(item)
+        return 0
+    except queue.Full:
+        if drop_policy == 'drop_newest':
+            return 1
+    # drop_oldest：丢掉最早的一条，给最新的腾位置
+    try:
+        bounded_queue.get_nowait()
+    except queue.Empty:
+        pass
+    try:
+        bounded_queue.put_nowait(item)
+    except queue.Full:
+        pass
+    return 1
@@ -0,0 +1,53 @@
+# replay_benchmark.py
+# 离线回放存档截图，测量整条游戏循环的吞吐
+import argparse
+import time
+
+from frame_source import ReplayFrameSource, VideoFrameSource
+from game_controller import GameController
+from input_backend import RecordingBackend
+from poll_scheduler import PollScheduler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='离线回放存档截图，测量游戏循环吞吐')
+    parser.add_argument('--images', default='images', help='截图存档目录')
+    parser.add_argument('--video', help='录屏视频，指定后按 x/y/width/distance 从视频中截取区域')
+    parser.add_argument('--origin', type=int, nargs=2, default=(0, 0), help='视频左上角对应的屏幕坐标')
+    parser.add_argument('--x', type=int, default=1437)
+    parser.add_argument('--y', type=int, default=883)
+    parser.add_argument('--width', type=int, default=54)
+    parser.add_argument('--distance', type=int, default=146)
+    parser.add_argument('--realtime', action='store_true', help='按原始时间间隔回放，默认全速')
+    parser.add_argument('--confidence', type=float, default=0.99)
+    parser.add_argument('--verbose', action='store_true', help='打印游戏日志')
+    args = parser.parse_args()
+
+    if args.video:
+        x, y, width, distance = args.x, args.y, args.width, args.distance
+        regions = [(x, y, x + width, y + width), (x + distance, y, x + distance + width, y + width)]
+        source = VideoFrameSource(args.video, regions, origin=args.origin, realtime=args.realtime)
+    else:
+        source = ReplayFrameSource(args.images, realtime=args.realtime)
+        print(f"找到 {len(source.pairs)} 组截图")
+
+    # 回放时不广播历史结果，按键只记录，无显示环境也能运行
+    game = GameController(x=args.x, y=args.y, width=args.width, distance=args.distance,
+                          hotkey_long='', hotkey_hu='', hotkey_he='',
+                          log_callback=print if args.verbose else None,
+                          update_image_callback=lambda *_: None,
+                          frame_source=source,
+                          # 回放节奏由帧来源决定，循环本身不限速
+                          scheduler=PollScheduler(idle_fps=0, backs_fps=0, reveal_fps=0),
+                          dry_run=True, input_backend=RecordingBackend())
+    start = time.perf_counter()
+    game.run(args.confidence)
+    elapsed = time.perf_counter() - start
+    game.stop()
+
+    frames = source.frames_read
+    print(f"帧数: {frames}  耗时: {elapsed:.3f} 秒  吞吐: {frames / elapsed if elapsed > 0 else 0:.1f} 帧/秒")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# result_cache.py
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+class ResultCache:
+    """按截图内容缓存识别结果的 LRU，同一张牌停留多帧时不必重复推理"""
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, image):
+        # 以完整的 RGB 字节为键，命中时字典会逐字节比较，像素有任何差异都不会误命中；
+        # 忽略 alpha 通道，cvtColor 拷贝成连续数组比切片后 tobytes 快得多
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR) if image.shape[2] == 4 else np.ascontiguousarray(image)
+        return rgb.shape, rgb.tobytes()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,242 @@
+# round_state.py
+# 一局的状态机：无牌 -> 看到牌背 -> 开牌识别 -> 已决策 -> 冷却，转移由表驱动，转移时通知监听者而不是拼日志字符串
+import argparse
+import csv
+import time
+from collections import namedtuple
+
+from poll_scheduler import PollScheduler
+
+# kind 为 'round'（牌局状态转移）或 'region'（单个区域的画面类别变化），duration 为离开的状态持续的秒数
+RoundEvent = namedtuple('RoundEvent', 'kind source target region time duration')
+
+
+class RoundStateMachine:
+    IDLE = 'idle'
+    BACKS_SHOWN = 'backs_shown'
+    REVEALING = 'revealing'
+    DECIDED = 'decided'
+    COOLDOWN = 'cooldown'
+    STATES = (IDLE, BACKS_SHOWN, REVEALING, DECIDED, COOLDOWN)
+
+    # 输入事件
+    BACKS = 'backs'            # 两张牌背经背景模型确认
+    FRONT = 'front'            # 任一区域出现牌面
+    CLEAR = 'clear'            # 两个区域都无牌
+    CONFIDENT = 'confident'    # 两张牌面识别置信度达标
+    UNSURE = 'unsure'          # 识别置信度不够
+    GIVE_UP = 'give_up'        # 识别次数超限或超时，放弃本局
+
+    # 状态转移表，不在表中的 (状态, 事件) 保持原状态
+    TRANSITIONS = {
+        (IDLE, BACKS): BACKS_SHOWN,
+        (BACKS_SHOWN, FRONT): REVEALING,
+        (BACKS_SHOWN, CLEAR): IDLE,
+        (REVEALING, BACKS): BACKS_SHOWN,
+        (REVEALING, CONFIDENT): DECIDED,
+        (REVEALING, CLEAR): IDLE,
+        (REVEALING, GIVE_UP): IDLE,
+        (DECIDED, FRONT): COOLDOWN,
+        (DECIDED, BACKS): BACKS_SHOWN,
+        (DECIDED, CLEAR): IDLE,
+        (COOLDOWN, BACKS): BACKS_SHOWN,
+        (COOLDOWN, CLEAR): IDLE,
+    }
+
+    # observe() 返回给调用方需要执行的动作
+    NONE = None
+    CHECK_BACKS = 'check_backs'
+    RECOGNIZE = 'recognize'
+
+    # decide() 的结果
+    BET = 'bet'
+    TOO_MANY_ATTEMPTS = 'too_many_attempts'
+    TIMED_OUT = 'timed_out'
+
+    # 单个区域的画面类别，与原来 status 列表的取值一致
+    REGION_NONE = 0
+    REGION_BACK = 1
+    REGION_OTHER = 2
+    REGION_FRONT = 3
+
+    def __init__(self, timeout=15.0, max_attempts=3, back_white_max=0.063, back_red_min=0.20,
+                 none_white_max=0.01, other_white_min=0.60, clock=time.monotonic):
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.back_white_max = back_white_max
+        self.back_red_min = back_red_min
+        self.none_white_max = none_white_max
+        self.other_white_min = other_white_min
+        self.clock = clock
+        self.listeners = []
+        self.state = self.IDLE
+        self.state_since = clock()
+        self.regions = [self.REGION_NONE, self.REGION_NONE]
+        self.backs_time = None
+        self.attempts = 0
+        # 每个状态的离开次数、累计与最长停留时间
+        self.durations = {state: [0, 0.0, 0.0] for state in self.STATES}
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def _emit(self, kind, source, target, region, now, duration):
+        event = RoundEvent(kind, source, target, region, now, duration)
+        for listener in self.listeners:
+            listener(event)
+
+    def _fire(self, event):
+        target = self.TRANSITIONS.get((self.state, event))
+        if target is None or target == self.state:
+            return False
+        now = self.clock()
+        duration = now - self.state_since
+        record = self.durations[self.state]
+        record[0] += 1
+        record[1] += duration
+        record[2] = max(record[2], duration)
+        source, self.state, self.state_since = self.state, target, now
+        self._emit('round', source, target, None, now, duration)
+        return True
+
+    def _set_region(self, region, value):
+        if self.regions[region] != value:
+            previous, self.regions[region] = self.regions[region], value
+            self._emit('region', previous, value, region, self.clock(), None)
+
+    def armed(self):
+        # 两个区域都不在牌背状态时才需要用背景模型确认牌背
+        return self.regions[0] != self.REGION_BACK and self.regions[1] != self.REGION_BACK
+
+    def expired(self):
+        return self.backs_time is None or self.clock() - self.backs_time >= self.timeout
+
+    def _give_up(self):
+        self.attempts = 0
+        self._fire(self.GIVE_UP)
+
+    def observe(self, white_ratio1, red_ratio1, white_ratio2, red_ratio2):
+        """每帧调用一次，返回需要调用方执行的动作：NONE / CHECK_BACKS / RECOGNIZE"""
+        white = (white_ratio1, white_ratio2)
+        red = (red_ratio1, red_ratio2)
+        if (red[0] > self.back_red_min and red[1] > self.back_red_min
+                and white[0] <= self.back_white_max and white[1] <= self.back_white_max):
+            if self.armed():
+                return self.CHECK_BACKS
+        else:
+            for region in (0, 1):
+                if white[region] <= self.none_white_max:
+                    self._set_region(region, self.REGION_NONE)
+                elif white[region] >= self.other_white_min:
+                    self._set_region(region, self.REGION_OTHER)
+                if self.back_white_max < white[region] < self.other_white_min:
+                    self._set_region(region, self.REGION_FRONT)
+            if self.regions[0] == self.REGION_NONE and self.regions[1] == self.REGION_NONE:
+                self._fire(self.CLEAR)
+
+        # 牌面：白色占比在区间内且多于红色
+        front = any(self.back_white_max <= white[region] < self.other_white_min and white[region] > red[region]
+                    for region in (0, 1))
+        if not front:
+            # 开牌超时且画面已不是牌面时回到无牌状态，不再以最快频率截图；仍是牌面时由 decide/reject 结束本局
+            if self.state == self.REVEALING and self.expired():
+                self._give_up()
+            return self.NONE
+        self._fire(self.FRONT)
+        return self.RECOGNIZE if self.state == self.REVEALING else self.NONE
+
+    def confirm_backs(self, confirmed):
+        """CHECK_BACKS 之后调用，confirmed 为背景模型是否确认两张都是牌背"""
+        if not confirmed:
+            return False
+        self._set_region(0, self.REGION_BACK)
+        self._set_region(1, self.REGION_BACK)
+        # 每次确认牌背都重新开始计时
+        self.backs_time = self.clock()
+        self._fire(self.BACKS)
+        return True
+
+    def reject(self):
+        """RECOGNIZE 之后识别置信度不够时调用；识别次数超限或超时时放弃本局，
+        返回 TOO_MANY_ATTEMPTS / TIMED_OUT，否则返回 NONE"""
+        self.attempts += 1
+        self._fire(self.UNSURE)
+        if self.attempts > self.max_attempts:
+            result = self.TOO_MANY_ATTEMPTS
+        elif self.expired():
+            result = self.TIMED_OUT
+        else:
+            return self.NONE
+        self._give_up()
+        return result
+
+    def decide(self):
+        """RECOGNIZE 之后识别置信度达标时调用，返回 BET / TOO_MANY_ATTEMPTS / TIMED_OUT"""
+        attempts = self.attempts
+        self.attempts = 0
+        self._fire(self.CONFIDENT)
+        if attempts > self.max_attempts:
+            return self.TOO_MANY_ATTEMPTS
+        if self.expired():
+            return self.TIMED_OUT
+        return self.BET
+
+    def poll_state(self):
+        """对应的截图频率档位"""
+        if self.state == self.BACKS_SHOWN:
+            return PollScheduler.BACKS
+        if self.state == self.REVEALING:
+            return PollScheduler.REVEAL
+        return PollScheduler.IDLE
+
+    def stats(self):
+        """每个状态的 (离开次数, 平均停留毫秒, 最长停留毫秒)"""
+        return {state: (count, total / count * 1000 if count else 0.0, longest * 1000)
+                for state, (count, total, longest) in self.durations.items()}
+
+
+def replay(path, **kwargs):
+    """用录制的比例序列驱动状态机，返回事件列表；
+    CSV 列：time, white1, red1, white2, red2, backs（背景模型是否确认牌背）, confident（识别是否达标）"""
+    rows = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            rows.append(row)
+    clock_time = [float(rows[0]['time']) if rows else 0.0]
+    machine = RoundStateMachine(clock=lambda: clock_time[0], **kwargs)
+    events = []
+    decisions = []
+    machine.add_listener(events.append)
+    for row in rows:
+        clock_time[0] = float(row['time'])
+        action = machine.observe(float(row['white1']), float(row['red1']), float(row['white2']), float(row['red2']))
+        if action == machine.CHECK_BACKS:
+            machine.confirm_backs(row.get('backs', '0') == '1')
+        elif action == machine.RECOGNIZE:
+            if row.get('confident', '0') == '1':
+                decisions.append((clock_time[0], machine.decide()))
+            else:
+                result = machine.reject()
+                if result:
+                    decisions.append((clock_time[0], result))
+    return machine, events, decisions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='用录制的白色/红色比例序列回放牌局状态机，打印状态转移和决策')
+    parser.add_argument('csv', help='列：time, white1, red1, white2, red2, backs, confident')
+    parser.add_argument('--timeout', type=float, default=15.0)
+    args = parser.parse_args()
+
+    machine, events, decisions = replay(args.csv, timeout=args.timeout)
+    for event in events:
+        if event.kind == 'round':
+            print(f"{event.time:10.3f}  {event.source} -> {event.target}  停留 {event.duration * 1000:.1f} 毫秒")
+    for decision_time, result in decisions:
+        print(f"{decision_time:10.3f}  决策: {result}")
+    for state, (count, average, longest) in machine.stats().items():
+        print(f"{state:<12} 次数 {count:<4} 平均 {average:.1f} 毫秒  最长 {longest:.1f} 毫秒")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+# runtime_profile.py
+# CPU 推理运行配置：算子内/算子间线程数、非规格化浮点清零、线程绑核
+# 两个分类器各自默认占满所有核心时会互相抢占，这是延迟尖刺的主要来源
+import argparse
+import configparser
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import torch
+
+
+def parse_cpus(text):
+    """'0-3,6' -> [0, 1, 2, 3, 6]，空字符串表示不绑核"""
+    cpus = set()
+    for part in (text or '').replace(' ', '').split(','):
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-')
+            cpus.update(range(int(first), int(last) + 1))
+        else:
+            cpus.add(int(part))
+    return sorted(cpus)
+
+
+def format_cpus(cpus):
+    return ','.join(str(cpu) for cpu in cpus)
+
+
+def available_cpus():
+    """当前线程可用的全部核心，需在绑核之前调用"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def pin_current_thread(cpus):
+    """把当前线程绑定到指定核心，不支持的平台返回 False；
+    Linux 下之后由它创建的线程（含推理线程池）继承该设置，Windows 下新线程使用进程的亲和性掩码，只有调用线程本身被绑定"""
+    if not cpus:
+        return False
+    if hasattr(os, 'sched_setaffinity'):
+        # Linux 下 pid 0 指调用线程
+        os.sched_setaffinity(0, cpus)
+        return True
+    if sys.platform == 'win32':
+        import ctypes
+
+        kernel32 = ctypes.windll.kernel32
+        kernel32.GetCurrentThread.restype = ctypes.c_void_p
+        kernel32.SetThreadAffinityMask.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+        kernel32.SetThreadAffinityMask.restype = ctypes.c_size_t
+        mask = sum(1 << cpu for cpu in cpus)
+        return kernel32.SetThreadAffinityMask(kernel32.GetCurrentThread(), mask) != 0
+    return False
+
+
+class RuntimeProfile:
+    """线程数为 0 时保持 PyTorch 默认值；绑核列表为空时不绑核"""
+
+    def __init__(self, intra_op_threads=0, inter_op_threads=0, flush_denormal=True, inference_cpus=None, gui_cpus=None):
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.flush_denormal = flush_denormal
+        self.inference_cpus = inference_cpus or []
+        self.gui_cpus = gui_cpus or []
+        # 绑核前记录全部可用核心，只给界面绑核时推理线程据此恢复
+        self.all_cpus = available_cpus()
+
+    @classmethod
+    def from_config(cls, config, section='Settings'):
+        return cls(
+            intra_op_threads=config.getint(section, 'intra_op_threads', fallback=0),
+            inter_op_threads=config.getint(section, 'inter_op_threads', fallback=0),
+            flush_denormal=config.getboolean(section, 'flush_denormal', fallback=True),
+            inference_cpus=parse_cpus(config.get(section, 'inference_cpus', fallback='')),
+            gui_cpus=parse_cpus(config.get(section, 'gui_cpus', fallback='')))
+
+    def apply(self):
+        """需在加载模型、首次推理之前调用，返回实际生效的配置说明"""
+        if self.intra_op_threads > 0:
+            torch.set_num_threads(self.intra_op_threads)
+        if self.inter_op_threads > 0:
+            try:
+                torch.set_num_interop_threads(self.inter_op_threads)
+            except RuntimeError:
+                # 算子间线程池已启动后不能再修改，只能在进程开始时设置一次
+                pass
+        # 权重和激活很小时非规格化浮点数会让乘加慢上百倍，直接按 0 处理
+        denormal = torch.set_flush_denormal(self.flush_denormal) if self.flush_denormal else False
+        return (f"intra_op_threads={torch.get_num_threads()}, inter_op_threads={torch.get_num_interop_threads()}, "
+                f"flush_denormal={denormal}")
+
+    def pin_inference_thread(self):
+        """绑定截图和推理线程，返回绑定的核心列表，未绑核时返回空列表；
+        Linux 下推理线程池由该线程创建，一并继承绑核设置；Windows 下线程池不继承，
+        只有 intra_op_threads = 1（推理在调用线程中执行）时绑核完全生效"""
+        # 只给界面绑核时，由界面线程创建的线程在 Linux 下继承了界面的核心，需恢复到全部核心
+        cpus = self.inference_cpus or (self.all_cpus if self.gui_cpus else [])
+        return cpus if pin_current_thread(cpus) else []
+
+    def pin_gui_thread(self):
+        # 界面主线程负责显示和存档，与推理错开核心
+        return pin_current_thread(self.gui_cpus)
+
+
+def run_worker(args):
+    """子进程内：按给定配置加载两个分类器，模拟每帧一次背景判断加一次牌面识别，输出 JSON"""
+    import numpy as np
+    from poker_cnn_classifier import PokerImageClassifier
+    from poker_cnn_classifier_3class import PokerImageClassifier3Class
+
+    profile = RuntimeProfile(args.intra, args.inter, not args.no_flush_denormal, parse_cpus(args.inference_cpus))
+    profile.apply()
+    profile.pin_inference_thread()
+    cnn = PokerImageClassifier(args.card_model, device='cpu', runtime=args.runtime)
+    cnn_3 = PokerImageClassifier3Class(args.background_model, device='cpu', runtime=args.runtime)
+    rng = np.random.default_rng(0)
+    images = [rng.integers(0, 256, (args.crop_size, args.crop_size, 4), dtype=np.uint8) for _ in range(2)]
+    for _ in range(args.warmup):
+        cnn_3.detect_batch(images)
+        cnn.detect_batch(images)
+    latencies = []
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        cnn_3.detect_batch(images)
+        cnn.detect_batch(images)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    print(json.dumps({
+        'intra': args.intra,
+        'inter': args.inter,
+        'mean_ms': statistics.mean(latencies),
+        'p50_ms': latencies[len(latencies) // 2],
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        'max_ms': latencies[-1],
+    }))
+
+
+def sweep(args):
+    # 算子间线程数每个进程只能设置一次，每组配置单独起一个子进程
+    cpu_count = len(parse_cpus(args.inference_cpus)) or os.cpu_count() or 1
+    intra_values = sorted({n for n in (1, 2, 3, 4, 6, 8, 12, 16) if n <= cpu_count} | {cpu_count})
+    results = []
+    for intra in intra_values:
+        for inter in (1, 2):
+            command = [sys.executable, os.path.abspath(__file__), '--worker', '--intra', str(intra),
+                       '--inter', str(inter), '--runtime', args.runtime, '--card-model', args.card_model,
+                       '--background-model', args.background_model, '--iterations', str(args.iterations),
+                       '--warmup', str(args.warmup), '--crop-size', str(args.crop_size),
+                       '--inference-cpus', args.inference_cpus]
+            if args.no_flush_denormal:
+                command.append('--no-flush-denormal')
+            output = subprocess.run(command, capture_output=True, text=True)
+            if output.returncode != 0:
+                print(f"intra={intra} inter={inter} 失败: {output.stderr.strip().splitlines()[-1:]}")
+                continue
+            result = json.loads(output.stdout.strip().splitlines()[-1])
+            results.append(result)
+            print(f"intra={intra:<3} inter={inter:<2} 平均 {result['mean_ms']:.3f}  p50 {result['p50_ms']:.3f}  "
+                  f"p99 {result['p99_ms']:.3f}  最大 {result['max_ms']:.3f} 毫秒/帧")
+    if not results:
+        return None
+    # 以 p99 为主要指标（延迟尖刺），平均值次之
+    return min(results, key=lambda r: (r['p99_ms'], r['mean_ms']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='测试不同线程配置下每帧推理延迟，推荐本机的最佳配置')
+    parser.add_argument('--runtime', default='eager', help='eager / torchscript / onnx / int8')
+    parser.add_argument('--card-model', default='best_poker_cnn.pth')
+    parser.add_argument('--background-model', default='best_poker_cnn_3class.pth')
+    parser.add_argument('--iterations', type=int, default=300)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--crop-size', type=int, default=54, help='截图区域边长，与 config.ini 中的 width 一致')
+    parser.add_argument('--inference-cpus', default='', help='推理线程绑定的核心，例如 0-3')
+    parser.add_argument('--no-flush-denormal', action='store_true')
+    parser.add_argument('--write-config', action='store_true', help='把推荐配置写入 config.ini')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--intra', type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument('--inter', type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    best = sweep(args)
+    if best is None:
+        print("没有可用的测试结果")
+        return
+    print(f"推荐配置: intra_op_threads = {best['intra']}, inter_op_threads = {best['inter']}  "
+          f"(p99 {best['p99_ms']:.3f} 毫秒/帧)")
+    if args.write_config:
+        config = configparser.ConfigParser()
+        config.read('config.ini')
+        if not config.has_section('Settings'):
+            config.add_section('Settings')
+        config.set('Settings', 'intra_op_threads', str(best['intra']))
+        config.set('Settings', 'inter_op_threads', str(best['inter']))
+        config.set('Settings', 'flush_denormal', str(not args.no_flush_denormal))
+        config.set('Settings', 'inference_cpus', args.inference_cpus)
+        with open('config.ini', 'w') as configfile:
+            config.write(configfile)
+        print("已写入 config.ini")
+
+
+if __name__ == '__main__':
+    main()
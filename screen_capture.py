@@ -0,0 +1,49 @@
+# screen_capture.py
+import threading
+
+import mss
+import numpy as np
+
+
+class ScreenCapture:
+    """常驻截图会话：每个线程复用一个 mss 实例，每帧只截取所有区域的外接矩形一次"""
+
+    def __init__(self, regions):
+        # 区域格式与 mss 一致: (left, top, right, bottom)
+        self.regions = [tuple(int(v) for v in region) for region in regions]
+        left = min(region[0] for region in self.regions)
+        top = min(region[1] for region in self.regions)
+        right = max(region[2] for region in self.regions)
+        bottom = max(region[3] for region in self.regions)
+        self.bounds = {'left': left, 'top': top, 'width': right - left, 'height': bottom - top}
+        # 每个区域在外接矩形中的切片
+        self.slices = [(slice(region[1] - top, region[3] - top), slice(region[0] - left, region[2] - left))
+                       for region in self.regions]
+        self._local = threading.local()
+
+    def _session(self):
+        sct = getattr(self._local, 'sct', None)
+        if sct is None:
+            # mss 实例不能跨线程使用，每个线程各建一个并一直复用
+            sct = mss.mss()
+            self._local.sct = sct
+        return sct
+
+    def grab(self):
+        """截取外接矩形，返回 BGRA 整帧 (H, W, 4)，直接引用 mss 的缓冲区不做拷贝"""
+        screenshot = self._session().grab(self.bounds)
+        return np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(screenshot.height, screenshot.width, 4)
+
+    def crop(self, frame):
+        """按区域切出零拷贝视图"""
+        return [frame[rows, cols] for rows, cols in self.slices]
+
+    def grab_regions(self):
+        return self.crop(self.grab())
+
+    def close(self):
+        """关闭当前线程的截图会话"""
+        sct = getattr(self._local, 'sct', None)
+        if sct is not None:
+            sct.close()
+            self._local.sct = None
@@ -16,6 +16,9 @@ setup(
         'pyautogui',
         'keyboard'
     ],
+    extras_require={
+        'onnx': ['onnx', 'onnxruntime'],
+    },
     entry_points={
         'console_scripts': [
             'wg-pork=game_controller:main',
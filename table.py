@@ -0,0 +1,76 @@
+# table.py
+from frame_change import FrameChangeDetector
+from round_state import RoundStateMachine
+from evidence_fusion import EvidenceFusion
+
+
+class Table:
+    """一张牌桌的布局、热键、牌局状态和统计；多张牌桌共用一次截图和一次批量推理"""
+
+    def __init__(self, name='', x=1437, y=883, width=54, distance=146, hotkey_long='1', hotkey_hu='2', hotkey_he='3',
+                 change_threshold=8, fusion_window=1, fusion_decay=1.0):
+        self.name = name
+        self.hotkey_long = hotkey_long
+        self.hotkey_hu = hotkey_hu
+        self.hotkey_he = hotkey_he
+        self.regions = [
+            (x, y, x + width, y + width),  # 龙牌截图区域
+            (x + distance, y, x + distance + width, y + width),  # 虎牌截图区域
+            (x - 121, y + 290, x - 121 + 100, y + 290 + 100),  # 龙下注点击区域
+            (x + 253, y + 290, x + 253 + 100, y + 290 + 100),  # 虎下注点击区域
+            (x + 45, y + 238, x + 45 + 100, y + 238 + 70)  # 和下注点击区域
+        ]
+        # 单桌时不加前缀，日志与原来一致
+        self.prefix = f"[{name}] " if name else ''
+        # 画面没有变化时跳过统计和识别
+        self.change_detector = FrameChangeDetector(threshold=change_threshold)
+        self.round = RoundStateMachine()
+        # 同一次开牌的多帧识别结果融合后再与置信度阈值比较
+        self.fusion = EvidenceFusion(window=fusion_window, decay=fusion_decay)
+        # 本局开牌那一帧的截图开始时刻（perf_counter_ns），用于统计开牌到按键的耗时
+        self.reveal_ns = None
+        self.frames = 0
+        self.changed_frames = 0
+        self.back_checks = 0
+        self.recognitions = 0
+        self.decisions = 0
+        self.fused_decisions = 0
+        self.bets = 0
+
+    @classmethod
+    def from_config(cls, config, section, change_threshold=8, fusion_window=1, fusion_decay=1.0):
+        """[table1] 等小节，键名与 [Settings] 中的单桌配置相同"""
+        return cls(name=section,
+                   x=config.getint(section, 'long_x'),
+                   y=config.getint(section, 'long_y'),
+                   width=config.getint(section, 'width'),
+                   distance=config.getint(section, 'distance'),
+                   hotkey_long=config.get(section, 'hotkey_long', fallback=''),
+                   hotkey_hu=config.get(section, 'hotkey_hu', fallback=''),
+                   hotkey_he=config.get(section, 'hotkey_he', fallback=''),
+                   change_threshold=change_threshold,
+                   fusion_window=fusion_window,
+                   fusion_decay=fusion_decay)
+
+    @staticmethod
+    def config_sections(config):
+        """配置文件中按 table1、table2 … 顺序排列的牌桌小节"""
+        sections = [section for section in config.sections()
+                    if section.startswith('table') and section[len('table'):].isdigit()]
+        return sorted(sections, key=lambda section: int(section[len('table'):]))
+
+    @property
+    def card_regions(self):
+        # 龙、虎两张牌的截图区域
+        return self.regions[:2]
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'changed_frames': self.changed_frames,
+            'back_checks': self.back_checks,
+            'recognitions': self.recognitions,
+            'decisions': self.decisions,
+            'fused_decisions': self.fused_decisions,
+            'bets': self.bets,
+        }
@@ -0,0 +1,180 @@
+# template_matcher.py
+# 最近邻模板匹配：同一客户端渲染的牌面几乎一样，差距足够明显时直接给出结果，否则交给 52 类 CNN
+import argparse
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from frame_source import load_bgra
+
+EMBED_SIZE = 16
+
+
+def embed(images, size=EMBED_SIZE):
+    """截图缩小到 size x size 彩色，去均值后归一化为单位向量，返回 (N, size * size * 3)"""
+    vectors = np.empty((len(images), size * size * 3), dtype=np.float32)
+    for vector, image in zip(vectors, images):
+        small = cv2.resize(image, (size, size), interpolation=cv2.INTER_AREA)[..., :3]
+        vector[:] = small.ravel()
+        vector -= vector.mean()
+        vector /= np.linalg.norm(vector) + 1e-6
+    return vectors
+
+
+class TemplateIndex:
+    """52 张牌面的参考模板，点积即余弦相似度"""
+
+    def __init__(self, templates, labels, min_similarity=0.97, min_margin=0.05, sources=None):
+        self.templates = np.ascontiguousarray(templates, dtype=np.float32)
+        self.labels = np.asarray(labels, dtype=np.int64)
+        # 模板取自的样本路径，评估时排除，只在未见过的样本上统计准确率
+        self.sources = [str(source) for source in sources] if sources is not None else []
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.hits = 0
+        self.misses = 0
+        self.match_time = 0.0
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        data = np.load(path)
+        return cls(data['templates'], data['labels'], sources=data['sources'] if 'sources' in data else None,
+                   **kwargs)
+
+    def save(self, path):
+        np.savez(path, templates=self.templates, labels=self.labels, sources=np.array(self.sources, dtype=str))
+
+    @classmethod
+    def build(cls, images, labels, per_class=8, seed=0, sources=None, **kwargs):
+        """每类随机保留最多 per_class 个样本作为模板，sources 为样本路径，随索引保存"""
+        labels = np.asarray(labels)
+        rng = np.random.default_rng(seed)
+        selected = []
+        for label in np.unique(labels):
+            indices = np.flatnonzero(labels == label)
+            selected.extend(rng.choice(indices, min(per_class, len(indices)), replace=False))
+        selected = sorted(selected)
+        return cls(embed([images[i] for i in selected]), labels[selected],
+                   sources=[sources[i] for i in selected] if sources is not None else None, **kwargs)
+
+    def match(self, images):
+        """返回每张图的类别，差距不够明显的返回 None"""
+        start = time.perf_counter()
+        similarities = embed(images) @ self.templates.T
+        results = []
+        for row in similarities:
+            best = int(np.argmax(row))
+            label = self.labels[best]
+            # 与最接近的其他类别比较
+            other = row[self.labels != label]
+            margin = row[best] - (other.max() if other.size else -1.0)
+            if row[best] >= self.min_similarity and margin >= self.min_margin:
+                results.append(int(label))
+                self.hits += 1
+            else:
+                results.append(None)
+                self.misses += 1
+        self.match_time += time.perf_counter() - start
+        return results
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'avg_match_ms': self.match_time / total * 1000 if total else 0.0,
+        }
+
+
+def labelled_dataset_samples(dataset_dir):
+    """datasets/xxx/images/*.jpg 与 datasets/xxx/labels/*.txt（首个数字为类别），返回 (路径, 类别) 列表"""
+    samples = []
+    dataset_dir = Path(dataset_dir)
+    for image_path in sorted((dataset_dir / 'images').glob('*.jpg')):
+        label_path = dataset_dir / 'labels' / f"{image_path.stem}.txt"
+        if not label_path.exists():
+            continue
+        with open(label_path, 'r') as f:
+            samples.append((image_path, int(f.read().split()[0])))
+    return samples
+
+
+def archive_samples(image_folder):
+    """GUI 存档的识别结果：images/YYYYMMDD/HH/{时间}_{花色*100+点数}_龙.png，返回 (路径, 类别) 列表"""
+    samples = []
+    for image_path in sorted(Path(image_folder).glob('*/*/*_*_*')):
+        parts = image_path.stem.split('_')
+        if len(parts) != 3 or not parts[1].isdigit():
+            continue
+        num = int(parts[1])
+        huase, card_num = num // 100, num % 100
+        if not (1 <= huase <= 4 and 1 <= card_num <= 13):
+            continue
+        samples.append((image_path, (huase - 1) * 13 + card_num - 1))
+    return samples
+
+
+def load_samples(samples):
+    return [load_bgra(path) for path, _ in samples], [label for _, label in samples]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='构建牌面模板索引，或在未用作模板的带标签样本上评估命中率和延迟')
+    parser.add_argument('command', choices=['build', 'eval'])
+    parser.add_argument('--datasets', nargs='*', default=['datasets/train_3class', 'datasets/val'],
+                        help='build 时抽取模板的数据集')
+    parser.add_argument('--eval-datasets', nargs='*', default=['datasets/val'], help='eval 时评估的数据集')
+    parser.add_argument('--archive', default='images', help='GUI 截图存档目录，为空则不使用')
+    parser.add_argument('--index', default='card_templates.npz')
+    parser.add_argument('--per-class', type=int, default=8)
+    parser.add_argument('--min-similarity', type=float, default=0.97)
+    parser.add_argument('--min-margin', type=float, default=0.05)
+    args = parser.parse_args()
+
+    samples = []
+    for dataset_dir in (args.datasets if args.command == 'build' else args.eval_datasets):
+        samples += labelled_dataset_samples(dataset_dir)
+    if args.archive:
+        samples += archive_samples(args.archive)
+
+    if args.command == 'build':
+        images, labels = load_samples(samples)
+        print(f"共 {len(images)} 张带标签的牌面，{len(set(labels))} 个类别")
+        index = TemplateIndex.build(images, labels, per_class=args.per_class,
+                                    sources=[path for path, _ in samples])
+        index.save(args.index)
+        print(f"模板索引已保存: {args.index}  模板数: {len(index.labels)}")
+        return
+
+    from poker_cnn_classifier import PokerImageClassifier
+
+    index = TemplateIndex.load(args.index, min_similarity=args.min_similarity, min_margin=args.min_margin)
+    if not index.sources:
+        print("索引中没有模板来源，无法排除模板样本，准确率偏高；请重新 build")
+    # 模板本身的相似度为 1，计入评估会虚高命中率和准确率
+    templates = set(index.sources)
+    held_out = [(path, label) for path, label in samples if str(path) not in templates]
+    images, labels = load_samples(held_out)
+    print(f"评估 {len(images)} 张未用作模板的牌面（排除模板样本 {len(samples) - len(held_out)} 张），"
+          f"{len(set(labels))} 个类别")
+    if not images:
+        return
+    results = index.match(images)
+    accepted = [(result, label) for result, label in zip(results, labels) if result is not None]
+    correct = sum(result == label for result, label in accepted)
+    stats = index.stats()
+    print(f"模板命中率: {stats['hit_rate']:.2%}  命中准确率: {correct / len(accepted) if accepted else 0:.4f}  "
+          f"平均匹配耗时: {stats['avg_match_ms']:.3f} 毫秒/张")
+
+    classifier = PokerImageClassifier()
+    start = time.perf_counter()
+    for image in images:
+        classifier.detect_image(image)
+    print(f"CNN 平均耗时: {(time.perf_counter() - start) / len(images) * 1000:.3f} 毫秒/张")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# tests/test_model_optimizer.py
+# 折叠 Normalize 和 BatchNorm 后的推理模型应与原模型输出一致
+import pytest
+import torch
+
+from model_optimizer import IMAGENET_MEAN, IMAGENET_STD, FusedPokerCNN, fuse_model, verify_fused
+from poker_cnn import PokerCNN
+from poker_cnn_3class import PokerCNN3Class
+
+
+def trained_like(model_class, num_classes):
+    """随机但非平凡的 BatchNorm 统计量与仿射参数，模拟训练后的模型"""
+    torch.manual_seed(num_classes)
+    model = model_class(num_classes=num_classes)
+    with torch.no_grad():
+        for bn in (model.bn1, model.bn2, model.bn3, model.bn4):
+            bn.running_mean.uniform_(-0.5, 0.5)
+            bn.running_var.uniform_(0.5, 2.0)
+            bn.weight.uniform_(0.5, 1.5)
+            bn.bias.uniform_(-0.2, 0.2)
+    return model.eval()
+
+
+def inputs(input_size=64):
+    """随机图片，加上纯色和只有边缘有内容的图片：这些输入的差别集中在零填充的边缘，用来检查 conv1_bias 的边缘项"""
+    torch.manual_seed(0)
+    images = [torch.rand(8, 3, input_size, input_size)]
+    for value in (0.0, 1.0, 0.5):
+        images.append(torch.full((1, 3, input_size, input_size), value))
+    images.append(torch.tensor(IMAGENET_MEAN).view(1, 3, 1, 1).expand(1, 3, input_size, input_size))
+    frame = torch.zeros(1, 3, input_size, input_size)
+    frame[..., :2, :] = frame[..., -2:, :] = frame[..., :, :2] = frame[..., :, -2:] = 1.0
+    images.append(frame)
+    return torch.cat(images)
+
+
+@pytest.mark.parametrize('model_class, num_classes', [(PokerCNN, 52), (PokerCNN3Class, 3)])
+def test_fused_matches_eager(model_class, num_classes):
+    model = trained_like(model_class, num_classes)
+    fused = fuse_model(model)
+    assert isinstance(fused, FusedPokerCNN)
+    x = inputs()
+    normalized = (x - torch.tensor(IMAGENET_MEAN).view(1, 3, 1, 1)) / torch.tensor(IMAGENET_STD).view(1, 3, 1, 1)
+    with torch.no_grad():
+        expected = model(normalized)
+        actual = fused(x)
+    torch.testing.assert_close(actual, expected, atol=1e-4, rtol=1e-4)
+    assert torch.equal(actual.argmax(1), expected.argmax(1))
+
+
+def test_border_bias_varies_with_position():
+    fused = fuse_model(trained_like(PokerCNN3Class, 3))
+    bias = fused.conv1_bias[0]
+    # 内部位置的偏置相同，角和边缘因零填充而不同
+    assert torch.allclose(bias[:, 1:-1, 1:-1], bias[:, 1:2, 1:2].expand_as(bias[:, 1:-1, 1:-1]))
+    assert not torch.allclose(bias[:, 0, 0], bias[:, 1, 1])
+
+
+def test_verify_fused_rejects_mismatch():
+    model = trained_like(PokerCNN3Class, 3)
+    fused = fuse_model(model)
+    with torch.no_grad():
+        fused.conv1_bias.zero_()
+    with pytest.raises(ValueError):
+        verify_fused(model, fused)
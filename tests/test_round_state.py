@@ -0,0 +1,154 @@
+# tests/test_round_state.py
+# 用录制的白色/红色比例序列驱动牌局状态机，检查状态转移、截图档位和决策
+from poll_scheduler import PollScheduler
+import round_state
+from round_state import RoundStateMachine
+
+# (white1, red1, white2, red2)
+NONE = (0.0, 0.0, 0.0, 0.0)
+BACKS = (0.03, 0.5, 0.03, 0.5)
+FRONT = (0.3, 0.05, 0.3, 0.05)
+
+
+def play(frames, **kwargs):
+    """frames 为 (时间, 比例, backs, confident) 序列，返回 (状态机, 状态转移, 决策, 每帧的截图档位)"""
+    now = [0.0]
+    machine = RoundStateMachine(clock=lambda: now[0], **kwargs)
+    transitions, decisions, poll_states = [], [], []
+    machine.add_listener(lambda event: transitions.append((event.source, event.target))
+                         if event.kind == 'round' else None)
+    for frame_time, ratios, backs, confident in frames:
+        now[0] = frame_time
+        action = machine.observe(*ratios)
+        if action == machine.CHECK_BACKS:
+            machine.confirm_backs(backs)
+        elif action == machine.RECOGNIZE:
+            result = machine.decide() if confident else machine.reject()
+            if result:
+                decisions.append(result)
+        poll_states.append(machine.poll_state())
+    return machine, transitions, decisions, poll_states
+
+
+def test_round_bets_when_recognized_in_time():
+    machine, transitions, decisions, poll_states = play([
+        (0.0, NONE, False, False),
+        (1.0, BACKS, True, False),
+        (2.0, FRONT, False, False),
+        (2.1, FRONT, False, True),
+        (2.2, FRONT, False, True),
+        (5.0, NONE, False, False),
+    ])
+    assert transitions == [('idle', 'backs_shown'), ('backs_shown', 'revealing'), ('revealing', 'decided'),
+                           ('decided', 'cooldown'), ('cooldown', 'idle')]
+    assert decisions == [RoundStateMachine.BET]
+    assert poll_states == [PollScheduler.IDLE, PollScheduler.BACKS, PollScheduler.REVEAL, PollScheduler.IDLE,
+                           PollScheduler.IDLE, PollScheduler.IDLE]
+
+
+def test_reveal_polls_fastest_until_decided():
+    _, _, _, poll_states = play([
+        (1.0, BACKS, True, False),
+        (2.0, FRONT, False, False),
+    ])
+    # 第一帧开牌时识别不确定，停留在开牌状态
+    assert poll_states == [PollScheduler.BACKS, PollScheduler.REVEAL]
+
+
+def test_unconfirmed_backs_stay_idle():
+    machine, transitions, _, _ = play([
+        (1.0, BACKS, False, False),
+        (2.0, FRONT, False, False),
+    ])
+    assert transitions == []
+    assert machine.state == RoundStateMachine.IDLE
+
+
+def test_cleared_table_while_backs_shown_returns_to_idle():
+    machine, transitions, _, poll_states = play([
+        (1.0, BACKS, True, False),
+        (2.0, NONE, False, False),
+    ])
+    assert transitions == [('idle', 'backs_shown'), ('backs_shown', 'idle')]
+    assert poll_states[-1] == PollScheduler.IDLE
+
+
+def test_cleared_table_while_revealing_returns_to_idle():
+    machine, transitions, decisions, poll_states = play([
+        (1.0, BACKS, True, False),
+        (2.0, FRONT, False, False),
+        (2.1, NONE, False, False),
+    ])
+    assert transitions[-1] == ('revealing', 'idle')
+    assert decisions == []
+    assert poll_states[-1] == PollScheduler.IDLE
+
+
+def test_unconfirmed_reveal_gives_up_after_max_attempts():
+    frames = [(1.0, BACKS, True, False)] + [(2.0 + i * 0.1, FRONT, False, False) for i in range(5)]
+    machine, transitions, decisions, poll_states = play(frames, max_attempts=3)
+    assert decisions == [RoundStateMachine.TOO_MANY_ATTEMPTS]
+    assert transitions[-1] == ('revealing', 'idle')
+    assert poll_states[-1] == PollScheduler.IDLE
+    assert machine.attempts == 0
+
+
+def test_reveal_without_recognition_times_out():
+    # 开牌后画面一直不是牌面（不触发识别），超时后也要回到无牌状态
+    other = (0.8, 0.0, 0.8, 0.0)
+    machine, transitions, decisions, poll_states = play([
+        (1.0, BACKS, True, False),
+        (2.0, FRONT, False, False),
+        (3.0, other, False, False),
+        (16.5, other, False, False),
+    ], timeout=15.0)
+    assert poll_states[2] == PollScheduler.REVEAL
+    assert transitions[-1] == ('revealing', 'idle')
+    assert poll_states[-1] == PollScheduler.IDLE
+
+
+def test_unsure_after_timeout_gives_up():
+    machine, transitions, decisions, poll_states = play([
+        (1.0, BACKS, True, False),
+        (2.0, FRONT, False, False),
+        (16.5, FRONT, False, False),
+    ], timeout=15.0, max_attempts=10)
+    assert decisions == [RoundStateMachine.TIMED_OUT]
+    assert transitions[-1] == ('revealing', 'idle')
+    assert poll_states[-1] == PollScheduler.IDLE
+
+
+def test_late_confident_recognition_is_timed_out():
+    machine, _, decisions, poll_states = play([
+        (1.0, BACKS, True, False),
+        (2.0, FRONT, False, False),
+        (16.5, FRONT, False, True),
+    ], timeout=15.0, max_attempts=10)
+    assert decisions == [RoundStateMachine.TIMED_OUT]
+    assert machine.state == RoundStateMachine.DECIDED
+    assert poll_states[-1] == PollScheduler.IDLE
+
+
+def test_backs_again_restarts_round():
+    _, transitions, decisions, _ = play([
+        (1.0, BACKS, True, False),
+        (2.0, FRONT, False, False),
+        (3.0, BACKS, True, False),
+        (4.0, FRONT, False, True),
+    ])
+    assert transitions == [('idle', 'backs_shown'), ('backs_shown', 'revealing'), ('revealing', 'backs_shown'),
+                           ('backs_shown', 'revealing'), ('revealing', 'decided')]
+    assert decisions == [RoundStateMachine.BET]
+
+
+def test_replay_csv(tmp_path):
+    path = tmp_path / 'ratios.csv'
+    path.write_text('time,white1,red1,white2,red2,backs,confident\n'
+                    '1.0,0.03,0.5,0.03,0.5,1,0\n'
+                    '2.0,0.3,0.05,0.3,0.05,0,1\n'
+                    '3.0,0.0,0.0,0.0,0.0,0,0\n', encoding='utf-8')
+    machine, events, decisions = round_state.replay(str(path))
+    assert [(event.source, event.target) for event in events if event.kind == 'round'] == [
+        ('idle', 'backs_shown'), ('backs_shown', 'revealing'), ('revealing', 'decided'), ('decided', 'idle')]
+    assert decisions == [(2.0, RoundStateMachine.BET)]
+    assert machine.stats()[RoundStateMachine.REVEALING][0] == 1
@@ -1,4 +1,6 @@
+import argparse
 import os
+import time
 import torch
 import torch.nn as nn
 import torch.optim as optim
@@ -6,7 +8,7 @@ from torch.utils.data import Dataset, DataLoader
 from torchvision import transforms
 from PIL import Image
 from pathlib import Path
-from poker_cnn_3class import PokerCNN3Class
+from poker_cnn_3class import PokerCNN3Class, PokerCNN3ClassTiny
 
 
 class PokerDataset(Dataset):
@@ -51,7 +53,7 @@ class PokerDataset(Dataset):
         return image, label
 
 
-def train_model(model, train_loader, val_loader, criterion, optimizer, num_epochs=100, device='cuda'):
+def train_model(model, train_loader, val_loader, criterion, optimizer, num_epochs=100, device='cuda', save_path='best_poker_cnn_3class.pth'):
     best_acc = 0.0
 
     for epoch in range(num_epochs):
@@ -115,19 +117,66 @@ def train_model(model, train_loader, val_loader, criterion, optimizer, num_epoch
         # 保存最佳模型
         if val_acc > best_acc:
             best_acc = val_acc
-            torch.save(model.state_dict(), 'best_poker_cnn_3class.pth')
+            torch.save(model.state_dict(), save_path)
 
         print()
 
 
+def cascade_report(model_path, tiny_model_path, img_dir, thresholds, batch_size=2):
+    """在验证集上比较完整模型、小模型和不同阈值下级联的准确率与每批延迟"""
+    import numpy as np
+    from frame_source import load_bgra
+    from poker_cnn_classifier_3class import PokerImageClassifier3Class
+
+    names = sorted(f for f in os.listdir(img_dir) if f.endswith(('.png', '.jpg', '.jpeg', '.bmp')))
+    images = [load_bgra(Path(img_dir) / name) for name in names]
+    labels = np.array([int(name.split('_')[0]) for name in names])
+    # 与游戏中一样按龙、虎两张一批
+    batches = [images[i:i + batch_size] for i in range(0, len(images), batch_size)]
+    classifier = PokerImageClassifier3Class(model_path, cascade_model_path=tiny_model_path)
+    classifier.warm_up()
+
+    def run(name, detect):
+        predicted = []
+        start = time.perf_counter()
+        for batch in batches:
+            predicted += detect(batch)[0]
+        elapsed = (time.perf_counter() - start) / len(batches) * 1000
+        accuracy = (np.array(predicted) == labels).mean()
+        fallback_rate = classifier.cascade_stats()['fallback_rate']
+        print(f"{name:<18} 准确率 {accuracy:.4f}  {elapsed:.3f} 毫秒/批  转完整模型 {fallback_rate:.1%}")
+        classifier.tiny_accepted = classifier.fallbacks = 0
+
+    print(f"验证集 {len(images)} 张，小模型输入 {classifier.tiny_model.input_size}x{classifier.tiny_model.input_size}")
+    run('完整模型', classifier._detect_full)
+    # 阈值为 0 时小模型的结果全部采用
+    classifier.cascade_threshold = 0.0
+    run('小模型', classifier._detect_batch)
+    for threshold in thresholds:
+        classifier.cascade_threshold = threshold
+        run(f'级联 阈值 {threshold}', classifier._detect_batch)
+
+
 def main():
+    parser = argparse.ArgumentParser(description='训练背景三分类模型；--tiny 训练级联用的低分辨率小模型')
+    parser.add_argument('--tiny', action='store_true', help='训练低分辨率小模型')
+    parser.add_argument('--input-size', type=int, default=24, help='小模型输入边长，需为 8 的倍数')
+    parser.add_argument('--report', action='store_true', help='不训练，输出级联的准确率与延迟报告')
+    parser.add_argument('--thresholds', type=float, nargs='*', default=[0.9, 0.95, 0.98, 0.99, 0.999])
+    args = parser.parse_args()
+
+    if args.report:
+        cascade_report('best_poker_cnn_3class.pth', 'best_poker_cnn_3class_tiny.pth', 'datasets/val_3class',
+                       args.thresholds)
+        return
+
     # 检查CUDA是否可用
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     print(f'Using device: {device}')
 
     # 数据预处理
     transform = transforms.Compose([
-        transforms.Resize((64, 64)),
+        transforms.Resize((args.input_size, args.input_size) if args.tiny else (64, 64)),
         transforms.ToTensor(),
         transforms.Normalize(mean=[0.485, 0.456, 0.406],
                              std=[0.229, 0.224, 0.225])
@@ -149,7 +198,10 @@ def main():
     val_loader = DataLoader(val_dataset, batch_size=32, shuffle=False, num_workers=4)
 
     # 创建模型
-    model = PokerCNN3Class(num_classes=3).to(device)
+    if args.tiny:
+        model = PokerCNN3ClassTiny(num_classes=3, input_size=args.input_size).to(device)
+    else:
+        model = PokerCNN3Class(num_classes=3).to(device)
 
     # 加载预训练模型权重
     # model.load_state_dict(torch.load('best_poker_cnn_3class.pth', map_location=device))
@@ -167,7 +219,8 @@ def main():
         criterion=criterion,
         optimizer=optimizer,
         num_epochs=40,
-        device=device
+        device=device,
+        save_path='best_poker_cnn_3class_tiny.pth' if args.tiny else 'best_poker_cnn_3class.pth'
     )
 
 
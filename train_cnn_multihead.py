@@ -0,0 +1,164 @@
+import os
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torch.utils.data import Dataset, DataLoader, ConcatDataset
+from torchvision import transforms
+import train_cnn
+import train_cnn_3class
+from poker_cnn_multihead import PokerCNNMultiHead
+
+# 缺少某个头的标签时用 -1 表示，计算损失时忽略
+IGNORE_LABEL = -1
+
+
+class HeadLabelDataset(Dataset):
+    """把单任务数据集的标签放到对应的头上，另一个头的标签置为 -1"""
+
+    def __init__(self, dataset, head):
+        self.dataset = dataset
+        self.head = head
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, idx):
+        image, label = self.dataset[idx]
+        if self.head == 'card':
+            return image, label, IGNORE_LABEL
+        return image, IGNORE_LABEL, label
+
+
+def head_loss(criterion, outputs, labels):
+    # 整个批次都没有该头的标签时不计损失
+    if (labels != IGNORE_LABEL).any():
+        return criterion(outputs, labels)
+    return outputs.sum() * 0.0
+
+
+def head_corrects(outputs, labels):
+    mask = labels != IGNORE_LABEL
+    _, preds = torch.max(outputs, 1)
+    return torch.sum(preds[mask] == labels[mask]).item(), mask.sum().item()
+
+
+def run_epoch(model, loader, criterion, optimizer, device, train):
+    model.train(train)
+    running_loss = 0.0
+    card_corrects = card_total = background_corrects = background_total = 0
+
+    with torch.set_grad_enabled(train):
+        for inputs, card_labels, background_labels in loader:
+            inputs = inputs.to(device)
+            card_labels = card_labels.to(device)
+            background_labels = background_labels.to(device)
+
+            if train:
+                optimizer.zero_grad()
+
+            card_outputs, background_outputs = model(inputs)
+            loss = head_loss(criterion, card_outputs, card_labels) + \
+                head_loss(criterion, background_outputs, background_labels)
+
+            if train:
+                loss.backward()
+                optimizer.step()
+
+            running_loss += loss.item() * inputs.size(0)
+            corrects, total = head_corrects(card_outputs, card_labels)
+            card_corrects += corrects
+            card_total += total
+            corrects, total = head_corrects(background_outputs, background_labels)
+            background_corrects += corrects
+            background_total += total
+
+    epoch_loss = running_loss / len(loader.dataset)
+    card_acc = card_corrects / card_total if card_total else 0.0
+    background_acc = background_corrects / background_total if background_total else 0.0
+    return epoch_loss, card_acc, background_acc
+
+
+def train_model(model, train_loader, val_loader, criterion, optimizer, num_epochs=60, device='cuda',
+                save_path='best_poker_cnn_multihead.pth'):
+    best_acc = 0.0
+
+    for epoch in range(num_epochs):
+        print(f'Epoch {epoch + 1}/{num_epochs}')
+        print('-' * 10)
+
+        # 训练阶段
+        loss, card_acc, background_acc = run_epoch(model, train_loader, criterion, optimizer, device, train=True)
+        print(f'Train Loss: {loss:.4f} Card Acc: {card_acc:.4f} Background Acc: {background_acc:.4f}')
+
+        # 验证阶段
+        loss, card_acc, background_acc = run_epoch(model, val_loader, criterion, optimizer, device, train=False)
+        print(f'Val Loss: {loss:.4f} Card Acc: {card_acc:.4f} Background Acc: {background_acc:.4f}')
+
+        # 两个头的平均准确率最高时保存
+        val_acc = (card_acc + background_acc) / 2
+        if val_acc > best_acc:
+            best_acc = val_acc
+            torch.save(model.state_dict(), save_path)
+
+        print()
+
+
+def main():
+    # 检查CUDA是否可用
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    print(f'Using device: {device}')
+
+    # 数据预处理
+    transform = transforms.Compose([
+        transforms.Resize((64, 64)),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=[0.485, 0.456, 0.406],
+                             std=[0.229, 0.224, 0.225])
+    ])
+
+    # 牌面数据集与背景数据集合并
+    train_dataset = ConcatDataset([
+        HeadLabelDataset(train_cnn.PokerDataset(img_dir='datasets/train_3class/images',
+                                                label_dir='datasets/train_3class/labels',
+                                                transform=transform), 'card'),
+        HeadLabelDataset(train_cnn_3class.PokerDataset(img_dir='datasets/train_3class',
+                                                       transform=transform), 'background'),
+    ])
+    val_dataset = ConcatDataset([
+        HeadLabelDataset(train_cnn.PokerDataset(img_dir='datasets/val/images',
+                                                label_dir='datasets/val/labels',
+                                                transform=transform), 'card'),
+        HeadLabelDataset(train_cnn_3class.PokerDataset(img_dir='datasets/val_3class',
+                                                       transform=transform), 'background'),
+    ])
+
+    # 创建数据加载器
+    train_loader = DataLoader(train_dataset, batch_size=32, shuffle=True, num_workers=4)
+    val_loader = DataLoader(val_dataset, batch_size=32, shuffle=False, num_workers=4)
+
+    # 创建模型
+    model = PokerCNNMultiHead(num_classes=52, num_background_classes=3).to(device)
+
+    # 主干和牌面头与 PokerCNN 同名，用已训练的 52 类模型初始化
+    if os.path.exists('best_poker_cnn.pth'):
+        model.load_state_dict(torch.load('best_poker_cnn.pth', map_location=device), strict=False)
+        print("Pre-trained card model loaded successfully.")
+
+    # 定义损失函数和优化器
+    criterion = nn.CrossEntropyLoss(ignore_index=IGNORE_LABEL)
+    optimizer = optim.Adam(model.parameters(), lr=0.001)
+
+    # 训练模型
+    train_model(
+        model=model,
+        train_loader=train_loader,
+        val_loader=val_loader,
+        criterion=criterion,
+        optimizer=optimizer,
+        num_epochs=60,
+        device=device
+    )
+
+
+if __name__ == '__main__':
+    main()